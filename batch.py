@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Animate the blueprints of several repositories in one run.
+
+All repositories are cloned, fetched from GitHub and built at the same time,
+with the builds of all of them sharing one pool of --jobs worker processes
+(see FairScheduler) as well as the DOT and GraphQL caches in --cache-dir.
+Each repository gets its own page, journal and frames in --output, as with
+main.py, and the run ends with batch-summary.json and batch.timings.json.
+
+Usage:
+    python batch.py https://github.com/owner/repo ... [--repos-file repos.txt] [main.py options]
+"""
+import argparse
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import copy
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+
+import instrument
+from main import (add_build_arguments, animate_repo, build_pool, check_build_arguments,
+                  parse_repo_url, require_github_token)
+
+class FairScheduler:
+    """
+    Shares one process pool between repositories. Every repository submits
+    its builds through its own queue(name), and whenever a worker becomes
+    free the next build is taken from the non-empty queues in turn, so a
+    repository with thousands of commits does not hold up the others.
+    """
+
+    def __init__(self, executor, jobs):
+        self.executor = executor
+        self.slots = max(jobs, 1)
+        self.running = 0
+        self.queues = {}
+        self.turns = deque()
+        self.lock = threading.RLock()
+
+    def queue(self, name):
+        """Returns an object whose submit(fn, *args) queues a build of repository name."""
+        scheduler = self
+
+        class Queue:
+            def submit(self, fn, *args):
+                return scheduler._submit(name, fn, args)
+        return Queue()
+
+    def _submit(self, name, fn, args):
+        future = Future()
+        with self.lock:
+            if name not in self.queues:
+                self.queues[name] = deque()
+                self.turns.append(name)
+            self.queues[name].append((future, fn, args))
+        self._dispatch()
+        return future
+
+    def _dispatch(self):
+        with self.lock:
+            while self.running < self.slots:
+                task = self._next_task()
+                if task is None:
+                    return
+                future, fn, args = task
+                self.running += 1
+                self.executor.submit(fn, *args).add_done_callback(
+                    lambda inner, future=future: self._finished(future, inner))
+
+    def cancel(self, name):
+        """Cancels the builds of repository name that have not started yet."""
+        with self.lock:
+            pending = self.queues.get(name, deque())
+            while pending:
+                future, _fn, _args = pending.popleft()
+                future.cancel()
+
+    def _next_task(self):
+        for _ in range(len(self.turns)):
+            name = self.turns[0]
+            self.turns.rotate(-1)
+            if self.queues[name]:
+                return self.queues[name].popleft()
+        return None
+
+    def _finished(self, future, inner):
+        with self.lock:
+            self.running -= 1
+        if inner.exception() is not None:
+            future.set_exception(inner.exception())
+        else:
+            future.set_result(inner.result())
+        self._dispatch()
+
+def read_repos(repo_urls, repos_file, default_rev):
+    """
+    Returns (URL, revision) pairs for the URLs given on the command line and
+    in repos_file, whose lines are a URL optionally followed by a revision.
+    Raises ValueError if two entries have the same repository name, since
+    clones and output files are named after it.
+    """
+    entries = [(url, default_rev) for url in repo_urls]
+    if repos_file:
+        with open(repos_file, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = line.split("#", 1)[0].split()
+                if fields:
+                    entries.append((fields[0], fields[1] if len(fields) > 1 else default_rev))
+    urls_by_name = {}
+    for url, _rev in entries:
+        _owner, name = parse_repo_url(url)
+        if name in urls_by_name:
+            raise ValueError(f"{urls_by_name[name]} and {url} would both be written to repos/{name} "
+                             f"and {name}.* in the output directory")
+        urls_by_name[name] = url
+    return entries
+
+def animate_one(args, repo_url, rev, output_directory, cache_dir, scheduler):
+    start = time.perf_counter()
+    summary = {"repo_url": repo_url, "rev": rev}
+    try:
+        github_owner, github_repo = parse_repo_url(repo_url)
+        repo_args = copy.copy(args)
+        repo_args.rev = rev
+        summary.update(animate_repo(repo_args, github_owner, github_repo, output_directory, cache_dir,
+                                    pool=scheduler.queue(repo_url)))
+        summary["status"] = "ok"
+    except Exception as e:
+        traceback.print_exc()
+        # Builds of this repository that are still queued would only hold up the others.
+        scheduler.cancel(repo_url)
+        summary.update(status="failed", error=str(e))
+    summary["wall_seconds"] = time.perf_counter() - start
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Animate the blueprints of several repositories in one run")
+    parser.add_argument("repo_urls", nargs="*", help="URLs of the projects on github")
+    parser.add_argument("--repos-file", type=str,
+                        help="File with one project URL per line, optionally followed by the revision (# starts a comment)")
+    add_build_arguments(parser)
+    args = parser.parse_args()
+    check_build_arguments(parser, args)
+    try:
+        repos = read_repos(args.repo_urls, args.repos_file, args.rev)
+    except ValueError as e:
+        parser.error(str(e))
+    if not repos:
+        parser.error("no repositories given")
+    require_github_token()
+
+    output_directory = os.path.expanduser(args.output)
+    os.makedirs(output_directory, exist_ok=True)
+    cache_dir = None if args.no_cache else os.path.expanduser(args.cache_dir)
+
+    records_dir = tempfile.mkdtemp(prefix="blueprint-timings-")
+    instrument.enable(records_dir, profile_commit=args.profile_commit, profile_dir=output_directory)
+    start = time.perf_counter()
+    try:
+        with build_pool(args.jobs, args.extractor) as executor:
+            scheduler = FairScheduler(executor, args.jobs)
+            with ThreadPoolExecutor(max_workers=len(repos)) as repo_executor:
+                summaries = list(repo_executor.map(
+                    lambda repo: animate_one(args, repo[0], repo[1], output_directory, cache_dir, scheduler),
+                    repos))
+    finally:
+        instrument.write_report(records_dir, os.path.join(output_directory, "batch.timings.json"))
+        shutil.rmtree(records_dir, ignore_errors=True)
+
+    summary_path = os.path.join(output_directory, "batch-summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump({"wall_seconds": time.perf_counter() - start, "repositories": summaries}, f, indent=2)
+
+    print(f"\n{'repository':<50} {'status':<8} {'commits':>8} {'frames':>7} {'wall s':>8}")
+    for summary in summaries:
+        print(f"{summary['repo_url']:<50} {summary['status']:<8} {summary.get('commits', '-'):>8} "
+              f"{summary.get('frames', '-'):>7} {summary['wall_seconds']:>8.1f}")
+    print(f"Summary written to {summary_path}")
+    if any(summary["status"] != "ok" for summary in summaries):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
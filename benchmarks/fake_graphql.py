@@ -0,0 +1,85 @@
+"""
+Local stand-in for the GitHub GraphQL endpoint, serving a git repository.
+
+Answers the two kinds of queries get_collaborators sends: the paged branch
+history and the batched object(oid:) lookups. Authors come from git, and
+every author is treated as a GitHub user named after the author name.
+
+Usage in a benchmark:
+    with serve(repo_path) as url:
+        get_collaborators.GRAPHQL_URL = url
+        ...
+"""
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import re
+import subprocess
+import threading
+
+PAGE_SIZE = 100
+OID_RE = re.compile(r'(\w+): object\(oid: "([0-9a-f]+)"\)')
+
+def read_commits(repo_path):
+    """Returns the commits of HEAD as GraphQL commit nodes, newest first."""
+    log = subprocess.run(["git", "log", "--format=%H%x00%cI%x00%an%x00%ae", "HEAD"],
+                         cwd=repo_path, capture_output=True, text=True, check=True).stdout
+    commits = []
+    for line in log.splitlines():
+        oid, date, name, email = line.split("\0")
+        login = re.sub(r"\W", "-", name)
+        commits.append({
+            "oid": oid,
+            "committedDate": date,
+            "authors": {"nodes": [{
+                "name": name,
+                "email": email,
+                "user": {"login": login,
+                         "avatarUrl": f"https://avatars.example.com/{login}",
+                         "url": f"https://github.com/{login}"},
+            }]},
+        })
+    return commits
+
+def make_handler(commits):
+    by_oid = {commit["oid"]: commit for commit in commits}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            query = request["query"]
+            if "history(" in query:
+                start = int(request["variables"].get("cursor") or 0)
+                page = commits[start:start + PAGE_SIZE]
+                history = {
+                    "pageInfo": {"hasNextPage": start + PAGE_SIZE < len(commits),
+                                 "endCursor": str(start + PAGE_SIZE)},
+                    "nodes": page,
+                }
+                data = {"repository": {"ref": {"target": {"history": history}}}}
+            else:
+                data = {"repository": {alias: by_oid.get(oid)
+                                       for alias, oid in OID_RE.findall(query)}}
+            body = json.dumps({"data": data}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+@contextmanager
+def serve(repo_path):
+    """Serves the history of repo_path on localhost, yielding the endpoint URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(read_commits(repo_path)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/graphql"
+    finally:
+        server.shutdown()
+        server.server_close()
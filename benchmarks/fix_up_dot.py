@@ -0,0 +1,99 @@
+"""
+Equivalence check and benchmark of fix_up_dot.
+
+Generates leanblueprint-style dependency graphs of several sizes, checks that
+the dot_canon canonicalizer gives byte-for-byte the output of the pydot round
+trip it replaced, and times both. Results are printed as JSON.
+
+Usage (from the repository root):
+    python -m benchmarks.fix_up_dot [--sizes 100 1000 5000] [--seed 0]
+"""
+import argparse
+import json
+import random
+import time
+
+import dot_canon
+import main
+
+COLORS = ["", "green", "blue", "darkgreen", "#FFAA33"]
+FILLCOLORS = ["", "#9CEC8B", "#A3D6FF", "#B0ECA3", "#1CAC78"]
+PREFIXES = ["thm", "lem", "def", "cor", "prop", ""]
+# Label fragments that exercise the different quoting rules.
+WORDS = ["main", "foo_bar", "x1", "1x", "node", "Graph", "a.b", "dé", "2", "3.5", "sum-free", "q\\\"t"]
+
+def random_id(rng, i):
+    prefix = rng.choice(PREFIXES)
+    word = rng.choice(WORDS)
+    return f"{prefix}:{word}{i}" if prefix else f"{word}_{i}"
+
+def quote(s):
+    if s.replace("_", "a").isalnum() and not s[0].isdigit() and s.isascii():
+        return s
+    return f'"{s}"'
+
+def synthetic_dot(nodes, rng):
+    """Returns agwrite-formatted DOT resembling what leanblueprint emits."""
+    ids = [random_id(rng, i) for i in range(nodes)]
+    lines = ['strict digraph "" {',
+             "\tgraph [bgcolor=transparent];",
+             '\tnode [label="\\N",\n\t\tpenwidth=1.8\n\t];',
+             "\tedge [arrowhead=vee];"]
+    order = list(range(nodes))
+    rng.shuffle(order)
+    for i in order:
+        attrs = {"label": ids[i].split(":")[-1], "shape": rng.choice(["box", "ellipse"])}
+        color = rng.choice(COLORS)
+        if color:
+            attrs["color"] = color
+        fillcolor = rng.choice(FILLCOLORS)
+        if fillcolor:
+            attrs["fillcolor"] = fillcolor
+            attrs["style"] = "filled"
+        body = ",\n\t\t".join(f"{k}={quote(v)}" for k, v in sorted(attrs.items()))
+        lines.append(f"\t{quote(ids[i])}\t[{body}];")
+        for _ in range(rng.randint(0, 3)):
+            if i == 0:
+                break
+            source = ids[rng.randrange(i)]
+            style = "\t[style=dashed]" if rng.random() < 0.5 else ""
+            lines.append(f"\t{quote(source)} -> {quote(ids[i])}{style};")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def best_time(function, arg, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(arg)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def run(sizes, seed, repeat):
+    rng = random.Random(seed)
+    results = []
+    for size in sizes:
+        dot = synthetic_dot(size, rng)
+        expected, pydot_seconds = best_time(main.fix_up_dot_pydot, dot, 1)
+        actual, canon_seconds = best_time(dot_canon.canonicalize, dot, repeat)
+        results.append({
+            "nodes": size,
+            "dot_bytes": len(dot),
+            "identical": actual == expected,
+            "pydot_seconds": pydot_seconds,
+            "dot_canon_seconds": canon_seconds,
+            "speedup": pydot_seconds / canon_seconds if canon_seconds else None,
+        })
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare dot_canon with the pydot fix_up_dot")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000], help="Node counts to test")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the generated graphs")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions for dot_canon (best is kept)")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.seed, args.repeat)
+    print(json.dumps(results, indent=2))
+    if not all(result["identical"] for result in results):
+        raise SystemExit("Error: dot_canon output differs from pydot")
@@ -0,0 +1,105 @@
+"""
+Offline benchmark of the main.py pipeline on a synthetic blueprint history.
+
+Generates a git repository with benchmarks.synthetic_repo, serves its history
+from a local stand-in for the GitHub GraphQL endpoint, and times the stages
+of main.py one after the other: the GraphQL fetch, list_commits_chronologically,
+DOT extraction, fix_up_dot and construct_html (for every frame encoding),
+plus the size of the generated HTML. Results are printed as JSON.
+
+Usage (from the repository root):
+    python -m benchmarks.pipeline [--nodes 200] [--edges 2] [--commits 50] [--churn 0.05]
+"""
+import argparse
+from contextlib import redirect_stdout
+import io
+import json
+import os
+import tempfile
+import time
+
+from benchmarks import fake_graphql, synthetic_repo
+import get_collaborators
+import latex_depgraph
+import main
+
+class Stages:
+    """Collects the wall time of named stages."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    def time(self, name, function, *args, **kwargs):
+        # The pipeline prints a lot of progress; keep it out of the JSON.
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            result = function(*args, **kwargs)
+        self.seconds[name] = time.perf_counter() - start
+        return result
+
+def extract_all(repo_path, commits, extractor):
+    if extractor == "latex":
+        return [latex_depgraph.get_depgraph(repo_path, commit.commit_id) for commit in commits]
+    return [main.extract_depgraph(repo_path, commit.commit_id, extractor) for commit in commits]
+
+def run(work_dir, nodes, edges, commits, churn, seed, extractor):
+    repo_path = os.path.join(work_dir, "repo")
+    start = time.perf_counter()
+    synthetic_repo.make_repo(repo_path, nodes=nodes, edges=edges, commits=commits,
+                             churn=churn, seed=seed)
+    generate_seconds = time.perf_counter() - start
+
+    stages = Stages()
+    listed = stages.time("list_commits", main.list_commits_chronologically,
+                         repo_path, "main", "1970-01-01")
+    with fake_graphql.serve(repo_path) as url:
+        get_collaborators.GRAPHQL_URL = url
+        revision_history_by_hash, all_contributors = stages.time(
+            "graphql_fetch", get_collaborators.get_revision_history_by_hash,
+            "bench", "repo", "main", shas=[commit.commit_id for commit in listed])
+    deduped = stages.time("dedupe_commits", main.dedupe_commits, listed)
+    raw = stages.time("extract", extract_all, repo_path, deduped, extractor)
+    dots = stages.time("fix_up_dot", lambda: [main.fix_up_dot(dot) if dot else None for dot in raw])
+    contributors, github_users_before = main.shown_contributors(all_contributors)
+    depgraphs = list(main.select_frames(deduped, dots, revision_history_by_hash, github_users_before))
+
+    html_bytes = {}
+    for encoding in main.FRAME_ENCODINGS:
+        outfile = os.path.join(work_dir, f"{encoding}.html")
+        stages.time(f"construct_html_{encoding}", main.construct_html, depgraphs, "bench/repo",
+                    outfile, contributors=contributors, frame_encoding=encoding)
+        html_bytes[encoding] = os.path.getsize(outfile)
+
+    return {
+        "parameters": {"nodes": nodes, "edges": edges, "commits": commits, "churn": churn,
+                       "seed": seed, "extractor": extractor},
+        "generate_repo_seconds": generate_seconds,
+        "listed_commits": len(listed),
+        "distinct_commits": len(deduped),
+        "frames": len(depgraphs),
+        "stages": stages.seconds,
+        "per_commit_seconds": {name: stages.seconds[name] / max(1, len(deduped))
+                               for name in ("extract", "fix_up_dot")},
+        "html_bytes": html_bytes,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the stages of main.py on a synthetic blueprint history")
+    parser.add_argument("--nodes", type=int, default=200, help="Nodes in the final blueprint")
+    parser.add_argument("--edges", type=int, default=2, help="Average \\uses per node")
+    parser.add_argument("--commits", type=int, default=50, help="Commits in the history")
+    parser.add_argument("--churn", type=float, default=0.05, help="Fraction of existing nodes changed per commit")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the generated history")
+    parser.add_argument("--extractor", choices=main.EXTRACTORS, default="latex",
+                        help="DOT extractor to time (the default needs no leanblueprint install)")
+    parser.add_argument("--output", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = run(work_dir, args.nodes, args.edges, args.commits, args.churn, args.seed,
+                      args.extractor)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
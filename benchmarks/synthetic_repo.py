@@ -0,0 +1,113 @@
+"""
+Generator of synthetic blueprint histories.
+
+make_repo creates a git repository whose blueprint/src grows to a given
+number of theorem-like nodes over a given number of commits. Every commit
+adds its share of new nodes and rewrites a `churn` fraction of the existing
+ones (new \\uses, \\leanok toggled), which is roughly how real blueprints
+evolve. The result is deterministic for a given seed.
+"""
+from dataclasses import dataclass, field
+import os
+import random
+import subprocess
+
+WEB_TEX = r"""\documentclass{report}
+\usepackage{amssymb, amsthm, mathtools}
+\usepackage[showmore, dvipsnames]{blueprint}
+\newtheorem{theorem}{Theorem}
+\newtheorem{proposition}[theorem]{Proposition}
+\newtheorem{lemma}[theorem]{Lemma}
+\newtheorem{corollary}[theorem]{Corollary}
+\theoremstyle{definition}
+\newtheorem{definition}[theorem]{Definition}
+\begin{document}
+\input{content}
+\end{document}
+"""
+
+KINDS = ["definition", "lemma", "lemma", "proposition", "theorem", "corollary"]
+
+AUTHORS = [("Ada", "ada@example.com"), ("Brook", "brook@example.com"),
+           ("Cam", "cam@example.com"), ("Dee", "dee@example.com")]
+
+@dataclass
+class Node:
+    kind: str
+    uses: list = field(default_factory=list)
+    proof_uses: list = field(default_factory=list)
+    leanok: bool = False
+    proof_leanok: bool = False
+
+def uses_tex(uses):
+    return "\\uses{" + ", ".join(f"n{j}" for j in uses) + "}" if uses else ""
+
+def node_tex(i, node):
+    leanok = "\\leanok" if node.leanok else ""
+    tex = (f"\\begin{{{node.kind}}}\\label{{n{i}}}\\lean{{N{i}}}{leanok}{uses_tex(node.uses)}\n"
+           f"Statement {i}.\n\\end{{{node.kind}}}\n")
+    if node.kind != "definition":
+        proof_leanok = "\\leanok" if node.proof_leanok else ""
+        tex += (f"\\begin{{proof}}{proof_leanok}{uses_tex(node.proof_uses)}\n"
+                f"Proof of {i}.\n\\end{{proof}}\n")
+    return tex + "\n"
+
+def random_uses(rng, i, edges):
+    if i == 0:
+        return []
+    count = min(i, rng.randint(0, 2 * edges))
+    return sorted(rng.sample(range(i), count))
+
+def new_node(rng, i, edges):
+    node = Node(kind=rng.choice(KINDS))
+    uses = random_uses(rng, i, edges)
+    split = rng.randint(0, len(uses))
+    node.uses, node.proof_uses = uses[:split], uses[split:]
+    return node
+
+def git(repo_path, *args, env=None):
+    subprocess.run(["git", *args], cwd=repo_path, check=True, env=env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def make_repo(repo_path, nodes=200, edges=2, commits=50, churn=0.05, seed=0):
+    """
+    Creates a git repository at repo_path with `commits` commits on main,
+    growing blueprint/src to `nodes` nodes that each \\uses about `edges`
+    earlier nodes, and modifying a `churn` fraction of the existing nodes in
+    every commit.
+    """
+    rng = random.Random(seed)
+    src_dir = os.path.join(repo_path, "blueprint", "src")
+    os.makedirs(src_dir, exist_ok=True)
+    git(repo_path, "init", "-q", "-b", "main")
+    with open(os.path.join(src_dir, "web.tex"), "w", encoding="utf-8") as f:
+        f.write(WEB_TEX)
+
+    graph = []
+    for c in range(commits):
+        target = round(nodes * (c + 1) / commits)
+        for i in range(len(graph), target):
+            graph.append(new_node(rng, i, edges))
+        for i in rng.sample(range(len(graph)), round(churn * len(graph))):
+            node = graph[i]
+            change = rng.random()
+            if change < 0.4:
+                node.leanok = not node.leanok
+            elif change < 0.7:
+                node.proof_leanok = not node.proof_leanok
+            else:
+                replacement = new_node(rng, i, edges)
+                node.uses, node.proof_uses = replacement.uses, replacement.proof_uses
+        with open(os.path.join(src_dir, "content.tex"), "w", encoding="utf-8") as f:
+            f.write("".join(node_tex(i, node) for i, node in enumerate(graph)))
+
+        name, email = AUTHORS[c % len(AUTHORS)]
+        # one commit a day from 2024-01-01
+        date = f"{1704067200 + c * 86400} +0000"
+        env = dict(os.environ,
+                   GIT_AUTHOR_NAME=name, GIT_AUTHOR_EMAIL=email,
+                   GIT_COMMITTER_NAME=name, GIT_COMMITTER_EMAIL=email,
+                   GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+        git(repo_path, "add", "-A")
+        git(repo_path, "commit", "-q", "--allow-empty", "-m", f"Commit {c}", env=env)
+    return repo_path
@@ -0,0 +1,83 @@
+"""
+Append-only journal of per-commit build results.
+
+Every finished commit is written to the journal as one JSON line, so that a
+run that is interrupted can be resumed with --resume without rebuilding the
+commits it already finished.
+"""
+import json
+import os
+
+def journal_path(output_dir, repo_name):
+    return os.path.join(output_dir, f"{repo_name}.journal.jsonl")
+
+def load_journal(path):
+    """
+    Returns a dict mapping commit IDs to journal entries. A partially written
+    last line, as left behind by a crash mid-write, is ignored.
+    """
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Ignoring truncated journal line in {path}")
+                continue
+            entries[entry["commit_id"]] = entry
+    return entries
+
+def find_entry(path, commit_id):
+    """
+    Returns the last journal entry of commit_id, or None if there is none.
+    Only the lines that mention commit_id are parsed.
+    """
+    found = None
+    if not os.path.exists(path):
+        return found
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if commit_id not in line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry["commit_id"] == commit_id:
+                found = entry
+    return found
+
+def open_journal(path, resume):
+    """
+    Opens the journal for appending, starting it afresh unless resuming. When
+    resuming, a partially written last line is cut off first, so that the
+    next entry does not get appended to it.
+    """
+    if resume and os.path.exists(path):
+        with open(path, "rb+") as f:
+            content = f.read()
+            if content and not content.endswith(b"\n"):
+                print(f"Removing truncated journal line from {path}")
+                f.truncate(content.rfind(b"\n") + 1)
+    return open(path, "a" if resume else "w", encoding="utf-8")
+
+def built_dots(entries):
+    """
+    Returns a dict mapping commit IDs to DOTs for the journal entries of
+    successful builds. Failed builds are left out, so they are retried.
+    """
+    return {commit_id: entry["dot"] for commit_id, entry in entries.items() if entry["dot"] is not None}
+
+def record(journal, commit, dot):
+    """Appends the result of building commit (dot is None if the build failed)."""
+    entry = {
+        "commit_id": commit.commit_id,
+        "timestamp": commit.timestamp.isoformat(),
+        "tree_hash": commit.tree_hash,
+        "dot": dot,
+    }
+    journal.write(json.dumps(entry) + "\n")
+    journal.flush()
+    os.fsync(journal.fileno())
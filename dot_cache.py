@@ -0,0 +1,50 @@
+"""
+On-disk cache of normalized dependency graph DOT.
+
+Entries are keyed by the git tree hash of the blueprint sources together with
+the versions of the packages that turn those sources into a graph, so a given
+blueprint state only ever has to be built once.
+"""
+import hashlib
+import os
+from importlib import metadata
+
+# Packages whose version changes the generated DOT.
+VERSIONED_PACKAGES = ["leanblueprint", "plastexdepgraph"]
+
+def toolchain_version():
+    """Returns a string identifying the installed blueprint toolchain."""
+    versions = []
+    for package in VERSIONED_PACKAGES:
+        try:
+            versions.append(f"{package}={metadata.version(package)}")
+        except metadata.PackageNotFoundError:
+            versions.append(f"{package}=unknown")
+    return ",".join(versions)
+
+def cache_key(tree_hash, version=None):
+    if version is None:
+        version = toolchain_version()
+    return hashlib.sha256(f"{version}\0{tree_hash}".encode("utf-8")).hexdigest()
+
+def cache_path(cache_dir, key):
+    return os.path.join(cache_dir, "dots", key[:2], key + ".dot")
+
+def load_dot(cache_dir, key):
+    """Returns the cached DOT for key, or None on a miss."""
+    path = cache_path(cache_dir, key)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def store_dot(cache_dir, key, dot):
+    path = cache_path(cache_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write to a temporary file first so that an interrupted run never
+    # leaves a truncated entry behind.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(dot)
+    os.replace(tmp_path, path)
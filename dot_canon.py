@@ -0,0 +1,243 @@
+"""
+Fast canonicalizer for the DOT dialect that leanblueprint generates.
+
+fix_up_dot used to round-trip every graph through pydot: parse it with
+pydot's pyparsing grammar, copy it into a new pydot.Dot with the nodes sorted
+by name, and serialize that. This module produces byte-for-byte the same
+output with a small regex tokenizer and a single pass over the statements.
+It is dramatically faster on graphs with thousands of nodes.
+
+Only the constructs that appear in blueprint graphs are supported: graph,
+node and edge attribute statements, graph attribute assignments, node
+statements and single edges. Anything else (subgraphs, edge chains, ports,
+HTML strings, ...) raises UnsupportedDot, and callers should fall back to
+pydot for such input.
+"""
+from dataclasses import dataclass, field
+import re
+
+class UnsupportedDot(ValueError):
+    """Raised for DOT input outside the dialect this module handles."""
+
+TOKEN_RE = re.compile(r"""
+    (?P<skip>\s+|//[^\n]*|/\*.*?\*/)
+  | (?P<quoted>"(?:[^"\\]|\\.)*")
+  | (?P<edgeop>->|--)
+  | (?P<punct>[{}\[\];,=])
+  | (?P<id>[A-Za-z_\x80-\U0010ffff][A-Za-z_0-9\x80-\U0010ffff]*
+         |-?(?:\.[0-9]+|[0-9]+(?:\.[0-9]*)?))
+""", re.VERBOSE | re.DOTALL)
+
+KEYWORDS = ("graph", "subgraph", "digraph", "node", "edge", "strict")
+
+# Quoting rules of pydot's quote_id_if_necessary and quote_attr_if_necessary,
+# which decide how the canonical output looks.
+NUMERIC_RE = re.compile(r"^([0-9]+\.?[0-9]*|[0-9]*\.[0-9]+)$")
+DBL_QUOTED_RE = re.compile(r'^".*"$', re.DOTALL)
+ALPHA_NUMS_RE = re.compile(r"^[_a-zA-Z][a-zA-Z0-9_]*$")
+ALPHA_NUMS_WITH_PORTS_RE = re.compile(r'^[_a-zA-Z][a-zA-Z0-9_:"]*[a-zA-Z0-9_"]+$')
+WITH_PORT_RE = re.compile(r"^([^:]*):([^:]*)$")
+
+@dataclass
+class ParsedDot:
+    strict: bool
+    graph_type: str
+    name: str
+    graph_attributes: dict = field(default_factory=dict)
+    # (name, attributes) and ((source, destination), attributes) pairs, with
+    # names exactly as written in the input, quotes included
+    nodes: list = field(default_factory=list)
+    edges: list = field(default_factory=list)
+
+def tokenize(dot):
+    tokens = []
+    pos = 0
+    length = len(dot)
+    while pos < length:
+        match = TOKEN_RE.match(dot, pos)
+        if not match:
+            raise UnsupportedDot(f"unexpected input at offset {pos}: {dot[pos:pos + 20]!r}")
+        pos = match.end()
+        kind = match.lastgroup
+        if kind == "skip":
+            continue
+        text = match.group()
+        if kind == "quoted" and "\\\n" in text:
+            raise UnsupportedDot("line continuation in quoted string")
+        tokens.append((kind, text))
+    return tokens
+
+def parse(dot):
+    """Parses dot into a ParsedDot, raising UnsupportedDot if it cannot."""
+    tokens = tokenize(dot)
+    count = len(tokens)
+    i = 0
+
+    def peek(offset=0):
+        return tokens[i + offset] if i + offset < count else (None, None)
+
+    def expect(text):
+        nonlocal i
+        if peek()[1] != text:
+            raise UnsupportedDot(f"expected {text!r}, got {peek()[1]!r}")
+        i += 1
+
+    def read_id():
+        nonlocal i
+        kind, text = peek()
+        if kind not in ("id", "quoted"):
+            raise UnsupportedDot(f"expected an ID, got {text!r}")
+        i += 1
+        return text
+
+    def read_attributes():
+        nonlocal i
+        attributes = {}
+        if peek()[1] != "[":
+            return attributes
+        i += 1
+        while peek()[1] != "]":
+            key = read_id()
+            expect("=")
+            attributes[key] = read_id()
+            if peek()[1] in (",", ";"):
+                i += 1
+        i += 1
+        if peek()[1] == "[":
+            raise UnsupportedDot("multiple attribute lists")
+        return attributes
+
+    strict = False
+    if peek()[1] is not None and peek()[1].lower() == "strict":
+        strict = True
+        i += 1
+    graph_type = (peek()[1] or "").lower()
+    if graph_type not in ("graph", "digraph"):
+        raise UnsupportedDot("not a graph")
+    i += 1
+    name = ""
+    if peek()[1] != "{":
+        name = read_id()
+    expect("{")
+
+    result = ParsedDot(strict=strict, graph_type=graph_type, name=name)
+    # pydot groups statements by node name and by edge endpoints, keeping
+    # the order in which each name or endpoint pair first appeared.
+    nodes = {}
+    edges = {}
+    while True:
+        kind, text = peek()
+        if text == "}":
+            i += 1
+            break
+        if text is None:
+            raise UnsupportedDot("unterminated graph")
+        if text == ";":
+            i += 1
+            continue
+        if kind == "id" and text.lower() == "subgraph" or text == "{":
+            raise UnsupportedDot("subgraphs are not supported")
+
+        first = read_id()
+        if peek()[1] == "=":
+            i += 1
+            result.graph_attributes[first] = read_id()
+        elif peek()[0] == "edgeop":
+            i += 1
+            second = read_id()
+            if peek()[0] == "edgeop":
+                raise UnsupportedDot("edge chains are not supported")
+            edges.setdefault((first, second), []).append(read_attributes())
+        else:
+            nodes.setdefault(first, []).append(read_attributes())
+
+    if i != count:
+        raise UnsupportedDot("trailing input after the graph")
+    result.nodes = [(name, attrs) for name, group in nodes.items() for attrs in group]
+    result.edges = [(ends, attrs) for ends, group in edges.items() for attrs in group]
+    return result
+
+def _any_needs_quotes(s):
+    if s.isdigit():
+        return False
+    if s.isalnum():
+        return s[0].isdigit()
+    has_high_chars = any(ord(c) > 0x7F or ord(c) == 0 for c in s)
+    if has_high_chars and not DBL_QUOTED_RE.match(s):
+        return True
+    if NUMERIC_RE.match(s) or DBL_QUOTED_RE.match(s):
+        return False
+    return None
+
+def _id_needs_quotes(s):
+    if s.lower() in KEYWORDS:
+        return False
+    any_result = _any_needs_quotes(s)
+    if any_result is not None:
+        return any_result
+    if ALPHA_NUMS_RE.match(s) or ALPHA_NUMS_WITH_PORTS_RE.match(s):
+        return False
+    match = WITH_PORT_RE.match(s)
+    if match:
+        return _id_needs_quotes(match.group(1)) or _id_needs_quotes(match.group(2))
+    return True
+
+def _make_quoted(s):
+    return '"' + s.replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r") + '"'
+
+def quote_id(s, unquoted_keywords=()):
+    if not s or s.lower() in unquoted_keywords:
+        return s
+    if s.lower() in KEYWORDS or _id_needs_quotes(s):
+        return _make_quoted(s)
+    return s
+
+def quote_attr(s):
+    if s.lower() in KEYWORDS:
+        return _make_quoted(s)
+    if _any_needs_quotes(s) is False:
+        return s
+    return _make_quoted(s)
+
+def format_attributes(attributes):
+    if not attributes:
+        return ""
+    return " [" + ", ".join(f"{key}={quote_attr(value)}"
+                            for key, value in attributes.items()) + "]"
+
+def format_endpoint(name):
+    if name.startswith('"') and name.endswith('"'):
+        return name
+    return quote_id(name)
+
+def to_string(parsed):
+    """Serializes parsed with its nodes sorted by name, as fix_up_dot does."""
+    header = []
+    if parsed.strict:
+        header.append("strict")
+    header.append(parsed.graph_type)
+    if parsed.name:
+        header.append(quote_id(parsed.name))
+    header.append("{\n")
+    out = [" ".join(header)]
+    for key, value in parsed.graph_attributes.items():
+        out.append(f"{key}={quote_attr(value)};\n")
+
+    edge_op = " -> " if parsed.graph_type == "digraph" else " -- "
+    for name, attributes in sorted(parsed.nodes, key=lambda node: node[0].strip('"')):
+        name = quote_id(name, unquoted_keywords=("graph", "node", "edge"))
+        if name in ("graph", "node", "edge") and not attributes:
+            # pydot drops attribute statements without attributes, but
+            # still writes their newline.
+            out.append("\n")
+            continue
+        out.append(f"{name}{format_attributes(attributes)};\n")
+    for (source, destination), attributes in parsed.edges:
+        out.append(f"{format_endpoint(source)}{edge_op}{format_endpoint(destination)}"
+                   f"{format_attributes(attributes)};\n")
+    out.append("}\n")
+    return "".join(out)
+
+def canonicalize(dot):
+    """Returns the fix_up_dot canonical form of dot, raising UnsupportedDot if it cannot."""
+    return to_string(parse(dot))
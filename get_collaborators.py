@@ -1,3 +1,5 @@
+from concurrent.futures import Future
+import json
 import requests
 import os
 
@@ -6,10 +8,31 @@ OWNER = "jcreedcmu"
 REPO = "Noperthedron"
 BRANCH = "main"
 TOKEN = os.getenv("GITHUB_TOKEN")
+GRAPHQL_URL = os.getenv("GITHUB_GRAPHQL_URL", "https://api.github.com/graphql")
+
+# Commits fetched per by-oid query
+OID_BATCH_SIZE = 100
+
+COMMIT_FIELDS = """
+                  oid
+                  committedDate
+                  # 'authors' includes the main author AND co-authors
+                  authors(first: 10) {
+                    nodes {
+                      name
+                      email
+                      user {
+                        login
+                        avatarUrl
+                        url
+                      }
+                    }
+                  }
+"""
 
 def run_graphql_query(query, variables):
     """Executes a GraphQL query against the GitHub API."""
-    url = "https://api.github.com/graphql"
+    url = GRAPHQL_URL
     headers = {
         "Authorization": f"bearer {TOKEN}",
         "Accept": "application/vnd.github.v3+json"
@@ -26,9 +49,13 @@ def run_graphql_query(query, variables):
 
     return json_data
 
-def fetch_history_graphql(owner, repo, branch):
+def fetch_history_graphql(owner, repo, branch, known_oids=()):
     """
     Fetches commit history including pre-resolved co-authors using GraphQL.
+    History is listed newest first, so fetching stops at the first commit in
+    known_oids: that commit and everything before it are already known.
+    Returns the commits before it and its OID, which is None if the whole
+    history was fetched.
     """
     print(f"Fetching commit history for {owner}/{repo} on '{branch}' via GraphQL...")
 
@@ -43,22 +70,7 @@ def fetch_history_graphql(owner, repo, branch):
                   hasNextPage
                   endCursor
                 }
-                nodes {
-                  oid
-                  committedDate
-                  # 'authors' includes the main author AND co-authors
-                  authors(first: 10) {
-                    nodes {
-                      name
-                      email
-                      user {
-                        login
-                        avatarUrl
-                        url
-                      }
-                    }
-                  }
-                }
+                nodes {""" + COMMIT_FIELDS + """                }
               }
             }
           }
@@ -91,7 +103,10 @@ def fetch_history_graphql(owner, repo, branch):
 
         history = repo_data['ref']['target']['history']
         batch = history['nodes']
-        commits.extend(batch)
+        for commit in batch:
+            if commit['oid'] in known_oids:
+                return commits, commit['oid']
+            commits.append(commit)
 
         print(f"Fetched {len(commits)} commits so far...")
 
@@ -99,12 +114,117 @@ def fetch_history_graphql(owner, repo, branch):
         has_next = page_info['hasNextPage']
         cursor = page_info['endCursor']
 
+    return commits, None
+
+def fetch_commits_by_oid(owner, repo, oids):
+    """Fetches the given commits, OID_BATCH_SIZE per query, skipping OIDs GitHub does not know."""
+    oids = list(oids)
+    commits = []
+    for start in range(0, len(oids), OID_BATCH_SIZE):
+        batch = oids[start:start + OID_BATCH_SIZE]
+        # One aliased object() lookup per commit; OIDs are hex, so they can
+        # go into the query text as they are.
+        lookups = "".join(
+            f"""
+        c{i}: object(oid: "{oid}") {{
+          ... on Commit {{{COMMIT_FIELDS}          }}
+        }}""" for i, oid in enumerate(batch))
+        query = f"""
+    query($owner: String!, $name: String!) {{
+      repository(owner: $owner, name: $name) {{{lookups}
+      }}
+    }}
+    """
+        data = run_graphql_query(query, {"owner": owner, "name": repo})
+        repo_data = data.get('data', {}).get('repository') or {}
+        commits.extend(commit for commit in repo_data.values() if commit)
+        print(f"Fetched {len(commits)} of {len(oids)} commits by SHA...")
+    return commits
+
+def history_cache_path(cache_dir, owner, repo, branch):
+    name = f"{owner}__{repo}__{branch}".replace("/", "_")
+    return os.path.join(cache_dir, "graphql", name + ".json")
+
+def load_history_cache(path):
+    if not os.path.exists(path):
+        return {"history": [], "by_oid": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def store_history_cache(path, cache):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
+
+def fetch_history_cached(owner, repo, branch, cache_dir=None, shas=None, listed_only=False):
+    """
+    Like fetch_history_graphql, but keeps what it fetched in cache_dir and
+    later only fetches the commits that are new since then.
+
+    Commits in shas that are not part of the fetched history (e.g. older
+    commits brought in by a merge after they were cached) are fetched by
+    SHA. With listed_only, the branch history is not paged through at all
+    and only the commits in shas are fetched.
+
+    The cache is only extended if the newly fetched history leads back to
+    its newest commit. Otherwise the branch was force-pushed or rebased, and
+    the cache is replaced with the whole history fetched anew.
+
+    shas may also be a Future, which is only waited for once the history has
+    been paged through, so that paging can overlap with listing the commits.
+    """
+    path = history_cache_path(cache_dir, owner, repo, branch) if cache_dir else None
+    cache = load_history_cache(path) if path else {"history": [], "by_oid": {}}
+
+    if not listed_only:
+        known = {commit['oid'] for commit in cache['history']}
+        new_commits, stopped_at = fetch_history_graphql(owner, repo, branch, known)
+        if cache['history'] and stopped_at == cache['history'][0]['oid']:
+            print(f"Fetched {len(new_commits)} new commits, the rest is cached")
+            cache['history'] = new_commits + cache['history']
+        else:
+            if stopped_at is not None:
+                print(f"The cached history of {branch} is no longer on the branch, fetching it again")
+                new_commits, _ = fetch_history_graphql(owner, repo, branch)
+            cache['history'] = new_commits
+
+    if isinstance(shas, Future):
+        shas = shas.result()
+    have = {commit['oid'] for commit in cache['history']} | set(cache['by_oid'])
+    missing = [sha for sha in shas or [] if sha not in have]
+    if missing:
+        for commit in fetch_commits_by_oid(owner, repo, missing):
+            cache['by_oid'][commit['oid']] = commit
+    if path:
+        store_history_cache(path, cache)
+
+    if listed_only:
+        known = {commit['oid']: commit for commit in cache['history']}
+        known.update(cache['by_oid'])
+        commits = [known[sha] for sha in set(shas or []) if sha in known]
+    else:
+        # Only the commits asked for: others fetched by SHA in earlier runs
+        # may no longer be on the branch.
+        in_history = {commit['oid'] for commit in cache['history']}
+        extra = [cache['by_oid'][sha] for sha in set(shas or [])
+                 if sha in cache['by_oid'] and sha not in in_history]
+        if not extra:
+            return cache['history']
+        commits = cache['history'] + extra
+    # Keep the newest-first order analyze_contributors_history expects.
+    commits.sort(key=lambda commit: commit['committedDate'], reverse=True)
     return commits
 
 def analyze_contributors_history(commits):
     """
     Iterates through commits chronologically.
     The GraphQL data is already structured with resolved users.
+
+    Returns the per-commit history and the table of contributors in the order
+    they first appeared. The contributors as of a commit are the first
+    contributor_count entries of the table.
     """
     # GraphQL returns newest first, reverse for chronological order
     chronological_commits = commits[::-1]
@@ -153,28 +273,29 @@ def analyze_contributors_history(commits):
             "commit_sha": sha,
             "date": date,
             "contributor_count": len(seen_contributors),
-            "contributors": list(seen_contributors.values())
         })
 
-    return history_data
+    return history_data, list(seen_contributors.values())
 
-def get_revision_history(owner, repo, branch="main"):
+def get_revision_history(owner, repo, branch="main", cache_dir=None, shas=None, listed_only=False):
     """
     Main entry point: fetches raw data via GraphQL and processes it.
-    Returns a list of dicts (chronological order).
+    Returns a list of dicts (chronological order) and the contributor table.
     """
-    raw_commits = fetch_history_graphql(owner, repo, branch)
+    raw_commits = fetch_history_cached(owner, repo, branch, cache_dir, shas, listed_only)
     return analyze_contributors_history(raw_commits)
 
-def get_revision_history_by_hash(owner, repo, branch="main"):
+def get_revision_history_by_hash(owner, repo, branch="main", cache_dir=None, shas=None,
+                                 listed_only=False):
     """
-    Wrapper to return a dictionary keyed by commit SHA.
+    Wrapper to return a dictionary keyed by commit SHA, and the contributor table.
     """
-    revision_history = get_revision_history(owner, repo, branch)
+    revision_history, contributors = get_revision_history(owner, repo, branch, cache_dir,
+                                                          shas, listed_only)
     result = {}
     for rev in revision_history:
         result[rev['commit_sha']] = rev
-    return result
+    return result, contributors
 
 if __name__ == "__main__":
     if not TOKEN:
@@ -183,14 +304,14 @@ if __name__ == "__main__":
 
     try:
         # Use the wrapper function to test
-        revision_history = get_revision_history(OWNER, REPO, BRANCH)
+        revision_history, contributors = get_revision_history(OWNER, REPO, BRANCH)
 
         if revision_history:
             latest = revision_history[-1]
             print(f"\n--- Analysis Complete (SHA: {latest['commit_sha'][:7]}) ---")
             print(f"Total Contributors: {latest['contributor_count']}")
             print("Contributors:")
-            for c in latest['contributors']:
+            for c in contributors[:latest['contributor_count']]:
                 type_label = "[GitHub]" if c['type'] == 'github_user' else "[Git]"
                 avatar = c['avatar_url'] if c['avatar_url'] else "(No Avatar)"
                 print(f" {type_label:8} {c['login']:<20} {avatar}")
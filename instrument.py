@@ -0,0 +1,168 @@
+"""
+Per-stage timing of a run.
+
+Code wraps its stages in `with instrument.stage(name, commit_id):`. Each
+stage records its wall time, CPU time (of the calling thread plus the
+subprocesses it ran with instrument.run) and peak RSS, as one JSON line in a
+file per process in the records directory. Worker processes find that
+directory through the environment, so their stages are recorded too, and
+write_report merges everything into a summary once the run is done.
+
+Peak RSS is the larger of this process's peak so far and the peak of the
+stage's own subprocesses, in kilobytes.
+"""
+from contextlib import contextmanager
+import cProfile
+import json
+import os
+import pstats
+import resource
+import subprocess
+import threading
+import time
+
+RECORDS_DIR_ENV = "BLUEPRINT_TIMINGS_DIR"
+PROFILE_COMMIT_ENV = "BLUEPRINT_PROFILE_COMMIT"
+PROFILE_DIR_ENV = "BLUEPRINT_PROFILE_DIR"
+
+# Number of commits listed in the report's slowest_commits
+SLOWEST_COMMITS = 10
+
+_current = threading.local()
+
+def enable(records_dir, profile_commit=None, profile_dir="."):
+    """
+    Turns recording on for this process and the worker processes it starts
+    from now on. With profile_commit (a commit ID or prefix), the build of
+    that commit is also run under cProfile, with the stats saved to profile_dir.
+    """
+    os.makedirs(records_dir, exist_ok=True)
+    os.environ[RECORDS_DIR_ENV] = records_dir
+    if profile_commit:
+        os.environ[PROFILE_COMMIT_ENV] = profile_commit
+        os.environ[PROFILE_DIR_ENV] = os.path.abspath(profile_dir)
+
+def _write(record):
+    records_dir = os.environ.get(RECORDS_DIR_ENV)
+    if not records_dir:
+        return
+    with open(os.path.join(records_dir, f"{os.getpid()}.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+@contextmanager
+def stage(name, commit_id=None):
+    if not os.environ.get(RECORDS_DIR_ENV):
+        yield
+        return
+    record = {"stage": name, "commit_id": commit_id, "child_cpu": 0.0, "child_peak_rss_kb": 0}
+    outer = getattr(_current, "record", None)
+    _current.record = record
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        _current.record = outer
+        self_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        _write({
+            "stage": name,
+            "commit_id": commit_id,
+            "wall": time.perf_counter() - wall_start,
+            "cpu": time.thread_time() - cpu_start + record["child_cpu"],
+            "peak_rss_kb": max(self_peak, record["child_peak_rss_kb"]),
+        })
+
+def run(args, check=False, **kwargs):
+    """
+    Like subprocess.run (without input or timeout), but also adds the CPU
+    time and peak RSS of the subprocess to the current stage.
+    """
+    with subprocess.Popen(args, **kwargs) as process:
+        _pid, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    record = getattr(_current, "record", None)
+    if record is not None:
+        record["child_cpu"] += usage.ru_utime + usage.ru_stime
+        record["child_peak_rss_kb"] = max(record["child_peak_rss_kb"], usage.ru_maxrss)
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, args)
+    return subprocess.CompletedProcess(args, process.returncode)
+
+@contextmanager
+def profile(commit_id):
+    """Runs the block under cProfile if commit_id is the commit chosen with enable()."""
+    target = os.environ.get(PROFILE_COMMIT_ENV)
+    if not target or not commit_id.startswith(target):
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = os.path.join(os.environ.get(PROFILE_DIR_ENV, "."), f"profile-{commit_id[:12]}.prof")
+        profiler.dump_stats(path)
+        print(f"Profile of {commit_id} saved to {path}")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+
+def load_records(records_dir):
+    records = []
+    for name in sorted(os.listdir(records_dir)):
+        if name.endswith(".jsonl"):
+            with open(os.path.join(records_dir, name), "r", encoding="utf-8") as f:
+                records.extend(json.loads(line) for line in f if line.strip())
+    return records
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def summarize(records):
+    """Returns per-stage totals and percentiles and the slowest commits of records."""
+    by_stage = {}
+    by_commit = {}
+    for record in records:
+        by_stage.setdefault(record["stage"], []).append(record)
+        if record["commit_id"]:
+            stages = by_commit.setdefault(record["commit_id"], {})
+            stages[record["stage"]] = stages.get(record["stage"], 0.0) + record["wall"]
+
+    stages = {}
+    for name, group in by_stage.items():
+        walls = sorted(record["wall"] for record in group)
+        stages[name] = {
+            "count": len(group),
+            "wall_total": sum(walls),
+            "cpu_total": sum(record["cpu"] for record in group),
+            "wall_p50": percentile(walls, 0.5),
+            "wall_p90": percentile(walls, 0.9),
+            "wall_p99": percentile(walls, 0.99),
+            "wall_max": walls[-1],
+            "peak_rss_kb": max(record["peak_rss_kb"] for record in group),
+        }
+    slowest = sorted(by_commit.items(), key=lambda item: sum(item[1].values()), reverse=True)
+    return {
+        "stages": stages,
+        "slowest_commits": [{"commit_id": commit_id, "wall": sum(walls.values()), "stages": walls}
+                            for commit_id, walls in slowest[:SLOWEST_COMMITS]],
+    }
+
+def write_report(records_dir, report_path):
+    """Writes the summary and all records of records_dir to report_path as JSON, and prints the summary."""
+    records = load_records(records_dir)
+    summary = summarize(records)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(dict(summary, records=records), f, indent=2)
+
+    print(f"\n{'stage':<20} {'count':>6} {'wall s':>10} {'cpu s':>10} {'p50 s':>8} {'p90 s':>8} {'max s':>8} {'peak MB':>8}")
+    for name, s in sorted(summary["stages"].items(), key=lambda item: -item[1]["wall_total"]):
+        print(f"{name:<20} {s['count']:>6} {s['wall_total']:>10.2f} {s['cpu_total']:>10.2f} "
+              f"{s['wall_p50']:>8.3f} {s['wall_p90']:>8.3f} {s['wall_max']:>8.3f} "
+              f"{s['peak_rss_kb'] / 1024:>8.0f}")
+    if summary["slowest_commits"]:
+        print("\nSlowest commits:")
+        for commit in summary["slowest_commits"]:
+            print(f"  {commit['commit_id'][:12]}  {commit['wall']:.2f} s")
+    print(f"Timing report written to {report_path}")
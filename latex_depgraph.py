@@ -0,0 +1,549 @@
+"""
+Native dependency graph extractor for Lean blueprints.
+
+Reads the blueprint LaTeX sources of a commit straight from the git object
+database and computes the same dependency graph DOT that `leanblueprint web`
+embeds in dep_graph_document.html, without checking anything out or running
+plasTeX. It understands the subset of LaTeX that matters for the graph:
+\\input/\\include, \\newtheorem, theorem-like environments and proofs,
+\\label, \\uses, \\proves, \\lean, \\leanok, \\mathlibok, \\notready and
+\\graphcolor, plus the `thms` and `nonreducedgraph` options of the blueprint
+package.
+
+Known differences from leanblueprint: nodes without a \\label get generated
+IDs that need not match plasTeX's, and edges are emitted in sorted order
+rather than leanblueprint's arbitrary set order (fix_up_dot keeps edge order,
+so compare graphs with compare_dots rather than as text).
+
+Usage:
+    python latex_depgraph.py REPO_PATH [--rev REV] [--compare]
+"""
+import argparse
+from dataclasses import dataclass, field
+import os
+import re
+import subprocess
+
+# Bump whenever the generated DOT changes, to invalidate cached graphs.
+EXTRACTOR_VERSION = "2"
+
+# Sources are read from here; leanblueprint runs plasTeX on web.tex in it.
+SRC_DIR = "blueprint/src"
+MAIN_FILE = "web.tex"
+
+# Defaults of the plastexdepgraph package.
+DEFAULT_THM_TYPES = ["definition", "lemma", "proposition", "theorem", "corollary"]
+DEFAULT_SHAPES = {"definition": "box"}
+
+# Node colors of the leanblueprint package, which \graphcolor may override.
+DEFAULT_COLORS = {
+    "mathlib": "darkgreen",
+    "stated": "green",
+    "can_state": "blue",
+    "not_ready": "#FFAA33",
+    "proved": "#9CEC8B",
+    "can_prove": "#A3D6FF",
+    "defined": "#B0ECA3",
+    "fully_proved": "#1CAC78",
+}
+
+# Environments that step a counter themselves, so a \label directly inside
+# them refers to them rather than to the enclosing statement.
+NUMBERED_ENVS = {"equation", "align", "gather", "multline", "eqnarray",
+                 "figure", "table"}
+
+SECTIONING_COMMANDS = {"part", "chapter", "section", "subsection",
+                       "subsubsection", "paragraph", "subparagraph"}
+
+COMMENT_RE = re.compile(r"(?<!\\)%.*")
+INPUT_RE = re.compile(r"\\(?:input|include)\s*\{([^}]*)\}")
+NEWTHEOREM_RE = re.compile(r"\\newtheorem\s*\*?\s*\{([^}]*)\}")
+DECLARETHEOREM_RE = re.compile(r"\\declaretheorem\s*(?:\[[^\]]*\])?\s*\{([^}]*)\}")
+USEPACKAGE_RE = re.compile(r"\\usepackage\s*\[([^\]]*)\]\s*\{blueprint\}")
+BEGIN_DOCUMENT_RE = re.compile(r"\\begin\s*\{document\}")
+COMMAND_RE = re.compile(r"\\([A-Za-z@]+)(\*?)")
+
+# Compared by identity, so items can be graph nodes even when two of them
+# happen to have equal contents.
+@dataclass(eq=False)
+class Item:
+    """A labelable piece of the document: an environment or a sectioning command."""
+    kind: str
+    is_thm: bool = False
+    labels: list = field(default_factory=list)
+    uses: list = field(default_factory=list)
+    lean_decls: list = field(default_factory=list)
+    leanok: bool = False
+    mathlibok: bool = False
+    notready: bool = False
+    # For proofs: the label given to \proves, if any, and the statement
+    # the proof follows, which it proves otherwise
+    proves: str | None = None
+    follows: "Item | None" = None
+    # For statements: the proof environment proving it, if any
+    proof: "Item | None" = None
+
+    @property
+    def id(self):
+        # Like plasTeX, the last \label wins.
+        return self.labels[-1] if self.labels else None
+
+def read_blueprint_sources(repo_path, commit_id):
+    """Returns a dict mapping paths relative to SRC_DIR to file contents at commit_id."""
+    repo_path = os.path.expanduser(repo_path)
+    listing = subprocess.run(["git", "ls-tree", "-r", "-z", commit_id, "--", SRC_DIR + "/"],
+                             cwd=repo_path, capture_output=True, check=True).stdout
+    blobs = []
+    for entry in listing.split(b"\0"):
+        if not entry:
+            continue
+        meta, path = entry.split(b"\t", 1)
+        _mode, obj_type, sha = meta.split()
+        path = path.decode("utf-8")
+        if obj_type == b"blob" and path.endswith((".tex", ".sty")):
+            blobs.append((os.path.relpath(path, SRC_DIR), sha))
+
+    # One cat-file process for all blobs instead of one `git show` per file.
+    batch_input = b"".join(sha + b"\n" for _path, sha in blobs)
+    output = subprocess.run(["git", "cat-file", "--batch"], cwd=repo_path,
+                            input=batch_input, capture_output=True, check=True).stdout
+    sources = {}
+    pos = 0
+    for path, _sha in blobs:
+        header_end = output.index(b"\n", pos)
+        size = int(output[pos:header_end].split()[2])
+        content = output[header_end + 1:header_end + 1 + size]
+        sources[path] = content.decode("utf-8", errors="replace")
+        pos = header_end + 1 + size + 1
+    return sources
+
+def strip_comments(text):
+    return COMMENT_RE.sub("", text)
+
+def expand_inputs(sources, name, depth=0):
+    """Returns the comment-free text of file name with \\input and \\include inlined."""
+    if depth > 20:
+        return ""
+    for candidate in (name, name + ".tex"):
+        path = os.path.normpath(candidate)
+        if path in sources:
+            break
+    else:
+        print(f"latex_depgraph: cannot find input file {name}")
+        return ""
+    text = strip_comments(sources[path])
+    return INPUT_RE.sub(lambda m: expand_inputs(sources, m.group(1).strip(), depth + 1), text)
+
+def read_group(text, pos):
+    """
+    Reads a braced argument starting at pos, skipping leading whitespace.
+    Returns (content, position after the group), or (None, pos) if there is none.
+    """
+    start = pos
+    while start < len(text) and text[start].isspace():
+        start += 1
+    if start >= len(text) or text[start] != "{":
+        return None, pos
+    level = 0
+    i = start
+    while i < len(text):
+        c = text[i]
+        if c == "\\":
+            i += 2
+            continue
+        if c == "{":
+            level += 1
+        elif c == "}":
+            level -= 1
+            if level == 0:
+                return text[start + 1:i], i + 1
+        i += 1
+    return None, pos
+
+def split_list(arg):
+    return [part.strip() for part in arg.split(",") if part.strip()]
+
+def parse_package_options(text):
+    """Returns the dependency graph options given to \\usepackage[...]{blueprint}."""
+    options = {}
+    for match in USEPACKAGE_RE.finditer(text):
+        for option in split_list(match.group(1)):
+            key, _, value = option.partition("=")
+            options[key.strip()] = value.strip()
+    return options
+
+def parse_document(text, theorem_envs):
+    """
+    Scans the document body and returns the list of items it defines, in
+    document order.
+    """
+    items = []
+    stack = []
+    current_label_target = None
+    # Statement a proof without \proves refers to: the closest preceding
+    # theorem-like environment at the same level, as in plastexdepgraph.
+    last_statement = None
+
+    pos = 0
+    while True:
+        match = COMMAND_RE.search(text, pos)
+        if not match:
+            break
+        name = match.group(1)
+        pos = match.end()
+        holder = stack[-1] if stack else None
+
+        if name in ("begin", "end"):
+            env, pos = read_group(text, pos)
+            if env is None:
+                continue
+            env = env.strip()
+            if name == "begin":
+                item = Item(kind=env, is_thm=env in theorem_envs)
+                if env == "proof" and not stack:
+                    item.follows = last_statement
+                stack.append(item)
+                items.append(item)
+                if item.is_thm:
+                    current_label_target = item
+            else:
+                if not stack:
+                    continue
+                item = stack.pop()
+                if item.is_thm and not stack:
+                    last_statement = item
+        elif name in SECTIONING_COMMANDS:
+            item = Item(kind="")
+            items.append(item)
+            current_label_target = item
+            last_statement = None
+        elif name == "label":
+            label, pos = read_group(text, pos)
+            if holder is not None and (holder.is_thm or holder.kind in NUMBERED_ENVS):
+                target = holder
+            else:
+                target = current_label_target
+            if label and label.strip() and target is not None:
+                target.labels.append(label.strip())
+        elif name == "uses":
+            labels, pos = read_group(text, pos)
+            if labels is not None and holder is not None:
+                holder.uses.extend(split_list(labels))
+        elif name == "proves":
+            label, pos = read_group(text, pos)
+            if label is not None and holder is not None:
+                holder.proves = label.strip()
+        elif name == "lean":
+            decls, pos = read_group(text, pos)
+            if decls is not None and holder is not None:
+                holder.lean_decls.extend(split_list(decls))
+        elif name == "leanok":
+            if holder is not None:
+                holder.leanok = True
+        elif name == "mathlibok":
+            if holder is not None:
+                holder.leanok = True
+                holder.mathlibok = True
+        elif name == "notready":
+            if holder is not None:
+                holder.notready = True
+    return items
+
+def strongly_connected_components(nodes, successors):
+    """
+    Returns the strongly connected components of the graph as lists of nodes,
+    each after the components it has edges into (Tarjan's algorithm, without
+    recursion so that long chains of \\uses cannot exhaust the stack).
+    """
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors[root]))]
+        while work:
+            node, succs = work[-1]
+            for succ in succs:
+                if succ not in index:
+                    index[succ] = lowlink[succ] = len(index)
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(successors[succ])))
+                    break
+                if succ in on_stack:
+                    lowlink[node] = min(lowlink[node], index[succ])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member is node:
+                            break
+                    components.append(component)
+    return components
+
+def transitive_reduction(nodes, edges):
+    """
+    Returns the edges that are not implied by a longer path, like graphviz's
+    tred. edges maps (source, target) pairs to attributes. Cycles are reduced
+    as single nodes and the edges within them are all kept, so the result
+    does not depend on the order of nodes or edges, and nothing that was
+    reachable before becomes unreachable.
+    """
+    successors = {node: [] for node in nodes}
+    for source, target in edges:
+        successors[source].append(target)
+
+    # For every strongly connected component, successors first: the
+    # components reachable from it in one step and, as a bit mask over
+    # component numbers, in two or more.
+    component_of = {}
+    indirect = []
+    descendants = []
+    for i, component in enumerate(strongly_connected_components(successors, successors)):
+        for node in component:
+            component_of[node] = i
+        direct = {component_of[succ] for node in component for succ in successors[node]} - {i}
+        mask = 0
+        for j in direct:
+            mask |= descendants[j]
+        indirect.append(mask)
+        descendants.append(mask | sum(1 << j for j in direct))
+
+    return {(source, target): attrs for (source, target), attrs in edges.items()
+            if not indirect[component_of[source]] >> component_of[target] & 1}
+
+def quote_id(s):
+    """Quotes s the way graphviz's agwrite does."""
+    if re.fullmatch(r"[A-Za-z_\x80-\uffff][A-Za-z_0-9\x80-\uffff]*", s):
+        if s.lower() not in ("node", "edge", "graph", "digraph", "subgraph", "strict"):
+            return s
+    elif re.fullmatch(r"-?(\.[0-9]+|[0-9]+(\.[0-9]*)?)", s):
+        return s
+    return '"' + s.replace('"', '\\"') + '"'
+
+def format_attrs(attrs):
+    # agwrite writes attributes sorted by name and skips the empty default.
+    return ",\n\t\t".join(f"{key}={quote_id(value)}"
+                          for key, value in sorted(attrs.items()) if value != "")
+
+def build_dot(sources):
+    """Returns the dependency graph DOT for the given blueprint sources."""
+    all_text = "\n".join(strip_comments(text) for text in sources.values())
+    text = expand_inputs(sources, MAIN_FILE)
+    if not text:
+        return None
+
+    theorem_envs = set(NEWTHEOREM_RE.findall(all_text)) | set(DECLARETHEOREM_RE.findall(all_text))
+    theorem_envs = {env.strip() for env in theorem_envs} or set(DEFAULT_THM_TYPES)
+    options = parse_package_options(text)
+    thm_types = [thm.strip() for thm in options["thms"].split("+")] if options.get("thms") else DEFAULT_THM_TYPES
+    reduce_graph = "nonreducedgraph" not in options
+
+    colors = dict(DEFAULT_COLORS)
+    for match in re.finditer(r"\\graphcolor\s*\{([^}]*)\}\s*\{([^}]*)\}", text):
+        colors[match.group(1).strip()] = match.group(2).strip()
+
+    document = text
+    begin = BEGIN_DOCUMENT_RE.search(text)
+    if begin:
+        document = text[begin.end():]
+    items = parse_document(document, theorem_envs)
+
+    labels = {}
+    for item in items:
+        for label in item.labels:
+            labels[label] = item
+
+    # Attach proofs to statements; a resolvable \proves takes precedence.
+    for item in items:
+        if item.kind != "proof":
+            continue
+        statement = labels.get(item.proves, item.follows)
+        if statement is not None:
+            statement.proof = item
+
+    nodes = [item for item in items if item.kind in thm_types]
+    generated_ids = 0
+    for node in nodes:
+        if node.id is None:
+            generated_ids += 1
+            node.labels.append("a%.10d" % generated_ids)
+    node_set = set(nodes)
+
+    def resolve(names):
+        return [labels[name] for name in names if name in labels]
+
+    # Statement uses give dashed edges, proof uses solid ones. The graph is
+    # strict, so an edge present in both keeps the dashed style added first.
+    edges = {}
+    predecessors = {}
+    for node in nodes:
+        for used in resolve(node.uses):
+            edges.setdefault((used, node), {"style": "dashed"})
+            predecessors.setdefault(node, set()).add(used)
+        if node.proof is not None:
+            for used in resolve(node.proof.uses):
+                edges.setdefault((used, node), {})
+                predecessors.setdefault(node, set()).add(used)
+
+    ancestors_cache = {}
+    def ancestors(item):
+        if item not in node_set:
+            return set()
+        if item not in ancestors_cache:
+            result = set()
+            stack = list(predecessors.get(item, ()))
+            while stack:
+                pred = stack.pop()
+                if pred in result:
+                    continue
+                result.add(pred)
+                if pred in ancestors_cache:
+                    result |= ancestors_cache[pred]
+                else:
+                    stack.extend(predecessors.get(pred, ()))
+            ancestors_cache[item] = result
+        return ancestors_cache[item]
+
+    # Formalization status, as computed by leanblueprint's make_lean_data.
+    status = {}
+    for node in nodes:
+        used = resolve(node.uses)
+        can_state = all(thm.leanok for thm in used) and not node.notready
+        if node.proof is not None:
+            used = used + resolve(node.proof.uses)
+            can_prove = all(thm.leanok for thm in used)
+            proved = node.proof.leanok
+        else:
+            can_prove = False
+            proved = False
+        status[node] = {"can_state": can_state, "can_prove": can_prove, "proved": proved}
+    for node in nodes:
+        status[node]["fully_proved"] = all(
+            status.get(n, {}).get("proved", False) or n.kind == "definition"
+            for n in ancestors(node) | {node})
+
+    lines = ['strict digraph "" {',
+             "\tgraph [bgcolor=transparent];",
+             '\tnode [label="\\N",\n\t\tpenwidth=1.8\n\t];',
+             "\tedge [arrowhead=vee];"]
+    for node in sorted(nodes, key=lambda n: n.id):
+        attrs = node_attributes(node, status[node], colors)
+        lines.append(f"\t{quote_id(node.id)}\t[{format_attrs(attrs)}];")
+
+    edges = {(s, t): attrs for (s, t), attrs in edges.items()
+             if s in node_set and t in node_set}
+    if reduce_graph:
+        edges = transitive_reduction(node_set, edges)
+    for source, target in sorted(edges, key=lambda e: (e[0].id, e[1].id)):
+        line = f"\t{quote_id(source.id)} -> {quote_id(target.id)}"
+        attrs = format_attrs(edges[(source, target)])
+        lines.append(f"{line}\t[{attrs}];" if attrs else f"{line};")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def node_attributes(node, data, colors):
+    """Returns the DOT attributes leanblueprint's colorizers give node."""
+    color = ""
+    if node.mathlibok:
+        color = colors["mathlib"]
+    elif node.leanok:
+        color = colors["stated"]
+    elif data["can_state"]:
+        color = colors["can_state"]
+    elif node.notready:
+        color = colors["not_ready"]
+
+    fillcolor = ""
+    if data["proved"]:
+        fillcolor = colors["proved"]
+    elif data["can_prove"] and (data["can_state"] or node.leanok):
+        fillcolor = colors["can_prove"]
+    if node.kind == "definition":
+        if node.leanok:
+            fillcolor = colors["defined"]
+        elif data["can_state"]:
+            fillcolor = colors["can_prove"]
+    elif data["fully_proved"]:
+        fillcolor = colors["fully_proved"]
+
+    attrs = {"label": node.id.split(":")[-1],
+             "shape": DEFAULT_SHAPES.get(node.kind, "ellipse"),
+             "color": color}
+    if fillcolor:
+        attrs["style"] = "filled"
+        attrs["fillcolor"] = fillcolor
+    return attrs
+
+def get_depgraph(repo_path, commit_id):
+    """Drop-in replacement for main.get_depgraph that does not build anything."""
+    try:
+        sources = read_blueprint_sources(repo_path, commit_id)
+    except subprocess.CalledProcessError as e:
+        print(f"Error reading blueprint sources of {commit_id}: {e}")
+        return None
+    return build_dot(sources)
+
+def graph_contents(dot):
+    """Returns the nodes and edges of dot as dicts mapping them to their attributes."""
+    import pydot
+
+    graph = pydot.graph_from_dot_data(dot)[0]
+    nodes = {node.get_name().strip('"'): node.get_attributes()
+             for node in graph.get_nodes()
+             if node.get_name() not in ("graph", "node", "edge")}
+    edges = {(edge.get_source().strip('"'), edge.get_destination().strip('"')): edge.get_attributes()
+             for edge in graph.get_edges()}
+    return nodes, edges
+
+def compare_dots(expected, actual):
+    """Returns a list of human readable differences between two dependency graphs."""
+    expected_nodes, expected_edges = graph_contents(expected)
+    actual_nodes, actual_edges = graph_contents(actual)
+    differences = []
+    for kind, want, got in (("node", expected_nodes, actual_nodes),
+                            ("edge", expected_edges, actual_edges)):
+        for key in sorted(set(want) - set(got), key=str):
+            differences.append(f"missing {kind} {key}")
+        for key in sorted(set(got) - set(want), key=str):
+            differences.append(f"extra {kind} {key}")
+        for key in sorted(set(want) & set(got), key=str):
+            if want[key] != got[key]:
+                differences.append(f"{kind} {key}: expected {want[key]}, got {got[key]}")
+    return differences
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract a blueprint dependency graph from its LaTeX sources")
+    parser.add_argument("repo_path", help="Path to a clone of the blueprint project")
+    parser.add_argument("--rev", type=str, default="HEAD", help="Git revision to read the blueprint from")
+    parser.add_argument("--compare", action="store_true",
+                        help="Also run leanblueprint web on the revision and report differences")
+    args = parser.parse_args()
+
+    dot = get_depgraph(args.repo_path, args.rev)
+    if not args.compare:
+        print(dot)
+    else:
+        import main
+
+        expected = main.get_depgraph(args.repo_path, args.rev)
+        if expected is None or dot is None:
+            raise SystemExit("Error: could not produce both graphs")
+        differences = compare_dots(expected, dot)
+        for difference in differences:
+            print(difference)
+        print(f"{len(differences)} differences")
+        exit(1 if differences else 0)
@@ -0,0 +1,156 @@
+"""
+Offline Graphviz layout of the animation frames.
+
+By default the player lays out every frame in the browser with the Graphviz
+WASM build, which is the slowest part of playback on large graphs. This
+module runs the `dot` layout ahead of time, in parallel across frames, and
+pins every node of the canonical DOT at the position `dot` chose for it. The
+player then renders the frames with the neato engine, which keeps pinned
+nodes where they are and draws the edges as straight lines, so no layout
+or edge routing is left to do in the browser.
+
+precompute_union_layout goes further and lays out a single graph, the union
+of all frames, so that every node keeps one position for the whole
+animation and Graphviz runs once instead of once per frame.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import shutil
+import subprocess
+
+import dot_canon
+
+# Engine the player must use for DOT produced by pin_positions.
+PINNED_ENGINE = "neato"
+
+# Graph attributes that make neato keep pinned positions (given in points)
+# as they are and draw straight edges. Routing edges around the nodes
+# (splines=true) can take neato longer than laying out the graph with dot.
+PINNED_GRAPH_ATTRIBUTES = {
+    "inputscale": "72",
+    "overlap": "true",
+    "splines": "line",
+}
+
+def check_graphviz():
+    if shutil.which("dot") is None:
+        raise SystemExit("Error: precomputing layouts needs the Graphviz `dot` executable on PATH.")
+
+def dot_layout(dot):
+    """Runs the dot layout on dot and returns Graphviz's JSON description of the result."""
+    output = subprocess.run(["dot", "-Tjson0"], input=dot, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output)
+
+def node_positions(dot, layout=None):
+    """Returns a dict mapping the node names of dot to "x,y" positions in points, from layout if given."""
+    layout = layout or dot_layout(dot)
+    return {obj["name"]: obj["pos"] for obj in layout.get("objects", []) if "pos" in obj}
+
+def unquote(name):
+    if name.startswith('"') and name.endswith('"'):
+        return name[1:-1].replace('\\"', '"')
+    return name
+
+# Names of the invisible nodes that pin_positions places at the corners of extent
+EXTENT_NODES = ("__extent_min", "__extent_max")
+
+def pin_positions(dot, positions, extent=None):
+    """
+    Returns the canonical form of dot with every node pinned at its position
+    in positions. With extent, a Graphviz bounding box "llx,lly,urx,ury",
+    invisible nodes at its corners make the frame's drawing that size.
+    """
+    parsed = dot_canon.parse(dot)
+    parsed.graph_attributes.update(PINNED_GRAPH_ATTRIBUTES)
+    named = set()
+    for name, attributes in parsed.nodes:
+        if name in ("graph", "node", "edge"):
+            # attribute statements, not nodes
+            continue
+        key = unquote(name)
+        if key in positions:
+            attributes["pos"] = f'"{positions[key]}!"'
+            named.add(key)
+    # Nodes that only appear in edges get a node statement of their own.
+    for source, destination in (ends for ends, _attributes in parsed.edges):
+        for name in (source, destination):
+            key = unquote(name)
+            if key in positions and key not in named:
+                parsed.nodes.append((name, {"pos": f'"{positions[key]}!"'}))
+                named.add(key)
+    if extent:
+        llx, lly, urx, ury = extent.split(",")
+        for name, pos in zip(EXTENT_NODES, (f"{llx},{lly}", f"{urx},{ury}")):
+            parsed.nodes.append((name, {"pos": f'"{pos}!"', "style": "invis", "shape": "point",
+                                        "label": '""', "width": "0"}))
+    return dot_canon.to_string(parsed)
+
+def precompute_layout(dot):
+    try:
+        return pin_positions(dot, node_positions(dot))
+    except (subprocess.CalledProcessError, dot_canon.UnsupportedDot) as e:
+        print(f"Could not precompute layout, the player will lay out this frame itself: {e}")
+        return dot
+
+def precompute_layouts(dots, jobs=1):
+    """
+    Returns dots with precomputed layouts, laying out jobs frames at a time.
+    A frame whose layout fails is returned unchanged, and gets neato's own
+    layout in the player.
+    """
+    check_graphviz()
+    # The work happens in the dot subprocesses, so threads are enough.
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        return list(executor.map(precompute_layout, dots))
+
+def union_graph(dots):
+    """
+    Returns the canonical DOT of a graph with every node and edge of dots.
+    Nodes and edges keep their attributes from the last frame they appear
+    in, and graph attributes and attribute statements come from the frames
+    in order, so the last frame's win.
+    """
+    parsed = None
+    graph_attributes = {}
+    nodes = {}
+    edges = {}
+    for dot in dots:
+        parsed = dot_canon.parse(dot)
+        graph_attributes.update(parsed.graph_attributes)
+        for name, attributes in parsed.nodes:
+            nodes[unquote(name)] = (name, attributes)
+        for (source, destination), attributes in parsed.edges:
+            edges[unquote(source), unquote(destination)] = ((source, destination), attributes)
+    union = dot_canon.ParsedDot(strict=parsed.strict, graph_type=parsed.graph_type, name=parsed.name,
+                                graph_attributes=graph_attributes,
+                                nodes=list(nodes.values()), edges=list(edges.values()))
+    return dot_canon.to_string(union)
+
+def precompute_union_layout(dots):
+    """
+    Lays out the union of all dots once with dot, and returns dots with every
+    node pinned at its position in that layout. Every frame also gets the
+    bounding box of the union, so that the player shows them all at the same
+    scale. Frames that cannot be parsed are left out of the union and
+    returned unchanged.
+    """
+    check_graphviz()
+    parseable = []
+    for dot in dots:
+        try:
+            dot_canon.parse(dot)
+            parseable.append(dot)
+        except dot_canon.UnsupportedDot as e:
+            print(f"Leaving a frame out of the global layout, the player will lay it out itself: {e}")
+    if not parseable:
+        return list(dots)
+    try:
+        union = union_graph(parseable)
+        layout = dot_layout(union)
+    except subprocess.CalledProcessError as e:
+        print(f"Could not compute the global layout, the player will lay out the frames itself: {e}")
+        return list(dots)
+    positions = node_positions(union, layout)
+    pinned = {dot: pin_positions(dot, positions, extent=layout.get("bb")) for dot in parseable}
+    return [pinned.get(dot, dot) for dot in dots]
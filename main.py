@@ -1,14 +1,29 @@
 import argparse
+import checkpoint
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
+import difflib
+import dot_cache
+import dot_canon
 import get_collaborators
+import gzip
+import instrument
+import json
+import layout
+import latex_depgraph
+import offline
+import plastex_render
+import queue
 import os
 import re
+import sampling
 import shlex
+import shutil
 import subprocess
-import time
+import tempfile
 
-from git import Repo
 import pydot
 
 def get_depgraph(repo_path, commit_id):
@@ -33,18 +48,22 @@ def get_depgraph(repo_path, commit_id):
         try:
             print(f"Running: {cmd}")
             args = shlex.split(cmd)
-            subprocess.run(args, check=True, cwd=target_dir, env=subprocess_env, stdin=subprocess.DEVNULL)
+            # e.g. "git checkout", "leanblueprint web"
+            with instrument.stage(" ".join(args[:2]), commit_id):
+                instrument.run(args, check=True, cwd=target_dir, env=subprocess_env,
+                               stdin=subprocess.DEVNULL)
         except subprocess.CalledProcessError as e:
             print(f"Error running command '{cmd}': {e}")
             return None
 
     dg_filename = os.path.join(target_dir, "blueprint", "web", "dep_graph_document.html")
 
-    with open(dg_filename, "r", encoding="utf-8") as f:
-        content = f.read()
+    with instrument.stage("extract_regex", commit_id):
+        with open(dg_filename, "r", encoding="utf-8") as f:
+            content = f.read()
 
-    pattern = r"\.renderDot\(`(.*?)`"
-    matches = re.findall(pattern, content, re.DOTALL)
+        pattern = r"\.renderDot\(`(.*?)`"
+        matches = re.findall(pattern, content, re.DOTALL)
     if len(matches) == 0:
         print("no match!")
         return None
@@ -54,54 +73,296 @@ def get_depgraph(repo_path, commit_id):
     dot = matches[0]
     return dot
 
-@dataclass
-class CommitInfo:
-    commit_id: str
-    timestamp: datetime
+# Directory whose contents determine the dependency graph of a commit.
+# leanblueprint web only reads blueprint/src, so changes elsewhere in
+# blueprint/ (e.g. checked-in web or print output) cannot change the graph.
+BLUEPRINT_SRC_DIR = "blueprint/src"
 
-def list_commits_chronologically(repo_path, rev, start_date_str):
+def blueprint_tree_hash(repo_path, commit_id):
+    """Returns the git tree hash of the blueprint sources at commit_id."""
+    result = subprocess.run(["git", "rev-parse", f"{commit_id}:{BLUEPRINT_SRC_DIR}"],
+                            cwd=os.path.expanduser(repo_path),
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+# Ways of turning a commit into dependency graph DOT. "leanblueprint" checks
+# the commit out and runs `leanblueprint web`; "plastex" does the same work in
+# a warm worker process with plastex_render, skipping the HTML output; "latex"
+# parses the blueprint sources straight from git with latex_depgraph, without
+# a checkout or build.
+EXTRACTORS = ["leanblueprint", "plastex", "latex"]
+
+# Commits a plastex worker process renders before it is replaced by a fresh
+# one, so that state plasTeX leaves behind cannot pile up.
+PLASTEX_TASKS_PER_WORKER = 50
+
+def extract_depgraph(repo_path, commit_id, extractor="leanblueprint"):
+    if extractor == "latex":
+        with instrument.stage("latex_extract", commit_id):
+            return latex_depgraph.get_depgraph(repo_path, commit_id)
+    if extractor == "plastex":
+        return plastex_render.get_depgraph(repo_path, commit_id)
+    return get_depgraph(repo_path, commit_id)
+
+def extractor_version(extractor):
+    """
+    Returns a string that changes whenever extractor's output may change.
+    """
+    if extractor == "latex":
+        return f"latex_depgraph={latex_depgraph.EXTRACTOR_VERSION}"
+    if extractor == "plastex":
+        return f"plastex_render={plastex_render.RENDER_VERSION};{dot_cache.toolchain_version()}"
+    return dot_cache.toolchain_version()
+
+def get_normalized_depgraph(repo_path, commit_id, cache_dir=None, tree_hash=None,
+                            extractor="leanblueprint"):
+    """
+    Returns the fix_up_dot-normalized DOT for commit_id, extracting it only if
+    it is not already in the cache at cache_dir.
+    """
+    key = None
+    if cache_dir:
+        with instrument.stage("cache_lookup", commit_id):
+            if tree_hash is None:
+                tree_hash = blueprint_tree_hash(repo_path, commit_id)
+            if tree_hash:
+                key = dot_cache.cache_key(tree_hash, extractor_version(extractor))
+                dot = dot_cache.load_dot(cache_dir, key)
+        if key and dot is not None:
+            print(f"Cache hit for blueprint tree {tree_hash}")
+            return dot
+
+    with instrument.profile(commit_id):
+        dot = extract_depgraph(repo_path, commit_id, extractor)
+        if dot:
+            with instrument.stage("fix_up_dot", commit_id):
+                dot = fix_up_dot(dot)
+    if dot and key:
+        with instrument.stage("cache_store", commit_id):
+            dot_cache.store_dot(cache_dir, key, dot)
+    return dot
+
+# Directory for the worktrees of the current build worker process, and its
+# worktrees by repository, see _init_build_worker.
+_worker_scratch_dir = None
+_worker_worktrees = {}
+
+def _init_build_worker(scratch_dir):
+    """
+    Process pool initializer. Each worker checks out into git worktrees of
+    its own, created in scratch_dir by _worker_worktree, so that the in-place
+    checkout/build/clean cycle of get_depgraph does not collide with other
+    workers.
+    """
+    global _worker_scratch_dir
+    _worker_scratch_dir = scratch_dir
+
+def _worker_worktree(repo_path):
+    """Returns this worker's worktree of repo_path, creating it on first use."""
+    if repo_path in _worker_worktrees:
+        return _worker_worktrees[repo_path]
+    worktree = os.path.join(_worker_scratch_dir, f"worker-{os.getpid()}-{len(_worker_worktrees)}")
+    sparse_dirs = sparse_checkout_dirs(repo_path)
+    if sparse_dirs is None:
+        subprocess.run(["git", "worktree", "add", "--detach", worktree],
+                       check=True, cwd=repo_path, stdin=subprocess.DEVNULL)
+    else:
+        # Give the worktree the same sparse checkout before anything is
+        # checked out, so it never holds the full tree.
+        subprocess.run(["git", "worktree", "add", "--detach", "--no-checkout", worktree],
+                       check=True, cwd=repo_path, stdin=subprocess.DEVNULL)
+        for cmd in [["git", "sparse-checkout", "set", *sparse_dirs], ["git", "reset", "-q", "--hard"]]:
+            subprocess.run(cmd, check=True, cwd=worktree, stdin=subprocess.DEVNULL)
+    _worker_worktrees[repo_path] = worktree
+    return worktree
+
+def _build_in_worker(repo_path, commit, cache_dir, extractor):
+    print("commit ID:", commit.commit_id)
+    # Reading from the object database needs no worktree of its own.
+    path = repo_path if extractor == "latex" else _worker_worktree(repo_path)
+    return get_normalized_depgraph(path, commit.commit_id, cache_dir, commit.tree_hash, extractor)
+
+@contextmanager
+def build_pool(jobs, extractor):
+    """
+    Returns a process pool of jobs workers for _build_in_worker tasks, of any
+    number of repositories. The worktrees of its workers are removed when
+    the pool is closed.
+    """
+    max_tasks = PLASTEX_TASKS_PER_WORKER if extractor == "plastex" else None
+    scratch_dir = tempfile.mkdtemp(prefix="depgraph-worktrees-")
     try:
-        # Initialize the repository object
-        repo = Repo(repo_path)
+        with ProcessPoolExecutor(max_workers=max(jobs, 1), initializer=_init_build_worker,
+                                 initargs=(scratch_dir,), max_tasks_per_child=max_tasks) as executor:
+            yield executor
+    finally:
+        for name in os.listdir(scratch_dir):
+            worktree = os.path.join(scratch_dir, name)
+            subprocess.run(["git", "-C", worktree, "worktree", "remove", "--force", worktree])
+        shutil.rmtree(scratch_dir, ignore_errors=True)
 
-        # check if the repo is empty
-        if repo.bare:
-            print(f"The repository at {repo_path} is bare.")
-            return None
+def build_depgraphs(repo_path, commits, cache_dir=None, jobs=1, on_result=None,
+                    extractor="leanblueprint", pool=None):
+    """
+    Returns the normalized DOT (or None if the build failed) for each commit,
+    in the same order as commits. With jobs > 1 the builds run in that many
+    worker processes; extractors that need a checkout give each of them a
+    separate git worktree of repo_path. The plastex extractor always renders
+    in worker processes, even with jobs=1, to keep plasTeX out of this one.
+    If given, pool (e.g. a build_pool shared with other repositories) runs
+    the builds instead, and jobs is ignored.
 
-        # repo.iter_commits() defaults to 'master' (or current HEAD)
-        # and iterates backwards (newest -> oldest).
-        # We wrap it in list() and use reversed() to go Oldest -> Newest.
-        commits = list(repo.iter_commits(rev=rev, paths="blueprint", since=start_date_str))
-        commits.reverse() # In-place reversal is slightly more memory efficient than reversed()
+    Commits with the same blueprint tree (e.g. a revert to an earlier state)
+    are only built once. If given, on_result(commit, dot) is called for every
+    commit as soon as its result is known, in completion order.
 
-        print(f"Iterating {len(commits)} commits chronologically:\n")
+    commits may be any iterable, e.g. iter_commits_chronologically; builds
+    start as soon as their commits arrive.
+    """
+    commits_seen = []
+    groups = {}
+    dots_by_key = {}
+    def finished(key, dot):
+        dots_by_key[key] = dot
+        if on_result:
+            for commit in groups[key]:
+                on_result(commit, dot)
 
-        result = []
+    def tasks():
+        """Yields (key, commit) for the first commit of every blueprint tree."""
         for commit in commits:
-            # Convert unix timestamp to a readable date
-            commit_date = datetime.fromtimestamp(commit.committed_date)
+            commits_seen.append(commit)
+            key = commit.tree_hash or commit.commit_id
+            if key not in groups:
+                groups[key] = [commit]
+                yield key, commit
+                continue
+            groups[key].append(commit)
+            if key in dots_by_key and on_result:
+                # built before this commit arrived
+                on_result(commit, dots_by_key[key])
 
-            print(f"Commit: {commit.hexsha[:7]}")
-            print(f"Author: {commit.author.name} <{commit.author.email}>")
-            print(f"Date:   {commit_date}")
-            print(f"Message: {commit.message.strip()}")
-            print("-" * 40)
+    if pool is not None:
+        _run_in_pool(pool, os.path.expanduser(repo_path), tasks(), cache_dir, finished, extractor)
+    elif jobs <= 1 and extractor != "plastex":
+        for key, commit in tasks():
+            print("commit ID:", commit.commit_id)
+            finished(key, get_normalized_depgraph(repo_path, commit.commit_id, cache_dir,
+                                                  commit.tree_hash, extractor))
+    else:
+        with build_pool(jobs, extractor) as executor:
+            _run_in_pool(executor, os.path.expanduser(repo_path), tasks(), cache_dir, finished, extractor)
 
-            commit_info = CommitInfo(commit_id = commit.hexsha, timestamp = commit_date)
-            result.append(commit_info)
+    return [dots_by_key[commit.tree_hash or commit.commit_id] for commit in commits_seen]
 
+def _run_in_pool(executor, repo_path, tasks, cache_dir, finished, extractor):
+    # Results are handed to finished() in this thread, also while tasks are
+    # still being submitted.
+    done = queue.SimpleQueue()
+    submitted = 0
+    handled = 0
+    for key, commit in tasks:
+        future = executor.submit(_build_in_worker, repo_path, commit, cache_dir, extractor)
+        future.add_done_callback(lambda future, key=key: done.put((key, future)))
+        submitted += 1
+        while not done.empty():
+            key, future = done.get()
+            finished(key, future.result())
+            handled += 1
+    while handled < submitted:
+        key, future = done.get()
+        finished(key, future.result())
+        handled += 1
 
-        return result
+@dataclass
+class CommitInfo:
+    commit_id: str
+    timestamp: datetime
+    # git tree hash of BLUEPRINT_SRC_DIR, None if the commit does not have one
+    tree_hash: str | None = None
 
-    except Exception as e:
-        print(f"Error: {e}")
+def iter_distinct_commits(commits):
+    """
+    Collapses each run of consecutive commits with identical blueprint sources
+    into the first commit of the run, which is when that dependency graph
+    first appeared. This is the frame main() would keep anyway after building
+    the whole run, so dropping the rest up front changes nothing but the work.
+    Contributors of the dropped commits still show up from the next frame on,
+    since contributor counts are cumulative.
+
+    Yields the commits it keeps as soon as they are known.
+    """
+    previous = None
+    listed = kept = 0
+    for commit in commits:
+        listed += 1
+        if (previous is not None and commit.tree_hash is not None
+                and previous.tree_hash == commit.tree_hash):
+            continue
+        kept += 1
+        previous = commit
+        yield commit
+    print(f"{kept} of {listed} commits have distinct blueprint sources")
+
+def dedupe_commits(commits):
+    """Returns the commits iter_distinct_commits keeps, as a list."""
+    return list(iter_distinct_commits(commits))
+
+def iter_commits_chronologically(repo_path, rev, start_date_str):
+    """
+    Yields a CommitInfo for every commit of rev since start_date_str that
+    touched blueprint/, oldest first. The commits come from a single
+    `git log` and their blueprint tree hashes from a single
+    `git cat-file --batch-check`, and each is yielded as soon as git has
+    listed it.
+    """
+    repo_path = os.path.expanduser(repo_path)
+    log = subprocess.Popen(["git", "log", "--reverse", "--format=%H %ct", f"--since={start_date_str}",
+                            rev, "--", "blueprint"],
+                           cwd=repo_path, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL, text=True)
+    trees = subprocess.Popen(["git", "cat-file", "--batch-check=%(objectname) %(objecttype)"],
+                             cwd=repo_path, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    count = 0
+    complete = False
+    try:
+        for line in log.stdout:
+            commit_id, committed = line.split()
+            # Answered with "<tree hash> tree", or "<request> missing"
+            trees.stdin.write(f"{commit_id}:{BLUEPRINT_SRC_DIR}\n")
+            trees.stdin.flush()
+            answer = trees.stdout.readline().split()
+            tree_hash = answer[0] if answer[1:] == ["tree"] else None
+            count += 1
+            yield CommitInfo(commit_id=commit_id, timestamp=datetime.fromtimestamp(int(committed)),
+                             tree_hash=tree_hash)
+        complete = True
+    finally:
+        if not complete:
+            log.kill()
+        log.stdout.close()
+        log.wait()
+        # Build workers forked while the commits were listed hold cat-file's
+        # stdin open too, so it would never see the end of its input.
+        trees.kill()
+        trees.stdin.close()
+        trees.stdout.close()
+        trees.wait()
+    if log.returncode:
+        raise subprocess.CalledProcessError(log.returncode, log.args)
+    print(f"Listed {count} commits of {rev} that changed blueprint/")
+
+def list_commits_chronologically(repo_path, rev, start_date_str):
+    """Returns the commits iter_commits_chronologically yields, as a list."""
+    return list(iter_commits_chronologically(repo_path, rev, start_date_str))
 
 @dataclass
 class DepGraph:
     dot: str
     commit: CommitInfo
-    contributors: list
+    # number of entries of the contributor table shown with this frame
+    contributor_count: int
 
 OUTPUT_HEADER="""
 <!DOCTYPE html>
@@ -194,6 +455,9 @@ OUTPUT_HEADER="""
 <script>
 
 var dotIndex = 0;
+// Frames [startIndex, stopIndex) are animated, see start()
+var startIndex = 0;
+var stopIndex = 0;
 var paused = false;
 var graphDiv = document.getElementById("graph");
 var graphviz = d3.select("#graph").graphviz()
@@ -209,13 +473,27 @@ var graphviz = d3.select("#graph").graphviz()
             .duration(750);
     })
     //.logEvents(true)
-    .on("initEnd", render);
+    .on("initEnd", start);
+
+// ?start=S&stop=E plays only the transitions into frames S to E - 1, as used
+// by record_video.py to record segments in parallel. Frame S - 1 is shown
+// first, and data-ready is set on the body once it is fully drawn.
+function start() {
+    var params = new URLSearchParams(window.location.search);
+    startIndex = Math.min(Number(params.get("start") || 0), frame_count);
+    stopIndex = Math.min(Number(params.get("stop") || frame_count), frame_count);
+    dotIndex = Math.max(startIndex - 1, 0);
+    if (startIndex === 0) {
+        document.body.setAttribute("data-ready", "true");
+    }
+    render();
+}
 
 document.addEventListener("keydown", function(e) {
     if (e.key === " " || e.code === "Space") {
         e.preventDefault();
         paused = !paused;
-        if (!paused && dotIndex < dots.length) {
+        if (!paused && dotIndex < stopIndex) {
             render();
         }
     } else if (e.key === "r") {
@@ -225,8 +503,100 @@ document.addEventListener("keydown", function(e) {
     }
 });
 
+// Frames written with --frame-encoding delta have no "dot". Their "delta" is
+// a list of [start, deleteCount, lineIds] splices that turn the previous
+// frame's lines into this frame's, with the line texts in lines.
+function deltaDecoder(frames, lines) {
+    var frameLines = [];
+    var frameLinesIndex = -1;
+    return function (index) {
+        if (index < frameLinesIndex) {
+            frameLines = [];
+            frameLinesIndex = -1;
+        }
+        while (frameLinesIndex < index) {
+            frameLinesIndex += 1;
+            for (const [start, deleteCount, lineIds] of frames[frameLinesIndex].delta) {
+                frameLines.splice(start, deleteCount, ...lineIds);
+            }
+        }
+        return frameLines.map(id => lines[id]).join("\\n");
+    };
+}
+
+var inlineDecoder = null;
+
+function frameDot(index) {
+    var frame = dots[index];
+    if (frame.dot !== undefined) {
+        return frame.dot;
+    }
+    inlineDecoder = inlineDecoder || deltaDecoder(dots, dot_lines);
+    return inlineDecoder(index);
+}
+
+// Pages written with --frame-store have no dots. Their frames are in gzipped
+// NDJSON chunks of frame_store.chunk_size frames next to the page: a line
+// {"lines": [...]} and then one delta-encoded frame per line. Chunks are
+// fetched PREFETCH_FRAMES frames ahead of the one shown, and dropped once
+// played, so memory does not grow with the length of the history.
+var PREFETCH_FRAMES = 10;
+var chunks = {};
+
+function fetchChunk(chunkIndex) {
+    if (!(chunkIndex in chunks)) {
+        var name = "chunk-" + String(chunkIndex).padStart(5, "0") + ".ndjson.gz";
+        // XMLHttpRequest rather than fetch, which cannot read file:// pages.
+        chunks[chunkIndex] = new Promise(function (resolve, reject) {
+            var request = new XMLHttpRequest();
+            request.open("GET", frame_store.path + name);
+            request.responseType = "arraybuffer";
+            request.onload = () => resolve(request.response);
+            request.onerror = () => reject(new Error("Could not load " + name));
+            request.send();
+        }).then(function (buffer) {
+            var stream = new Blob([buffer]).stream().pipeThrough(new DecompressionStream("gzip"));
+            return new Response(stream).text();
+        }).then(function (text) {
+            var lines = text.split("\\n").filter(line => line).map(line => JSON.parse(line));
+            var frames = lines.slice(1);
+            return {frames: frames, dot: deltaDecoder(frames, lines[0].lines)};
+        });
+    }
+    return chunks[chunkIndex];
+}
+
+function loadFrame(index) {
+    if (typeof frame_store === "undefined") {
+        var frame = dots[index];
+        return Promise.resolve({dot: frameDot(index), timestamp: frame.timestamp,
+                                contributor_count: frame.contributor_count});
+    }
+    var size = frame_store.chunk_size;
+    var chunkIndex = Math.floor(index / size);
+    var lastChunk = Math.floor(Math.min(index + PREFETCH_FRAMES, frame_count - 1) / size);
+    for (const key of Object.keys(chunks)) {
+        if (Number(key) < chunkIndex) {
+            delete chunks[key];
+        }
+    }
+    for (var c = chunkIndex + 1; c <= lastChunk; c++) {
+        fetchChunk(c);
+    }
+    return fetchChunk(chunkIndex).then(function (chunk) {
+        var frame = chunk.frames[index - chunkIndex * size];
+        return {dot: chunk.dot(index - chunkIndex * size), timestamp: frame.timestamp,
+                contributor_count: frame.contributor_count};
+    });
+}
+
 function render() {
-    var depgraph = dots[dotIndex];
+    // record_video.py waits for this before it moves its virtual clock, so
+    // that downloading a chunk takes no time in the video.
+    window.__frameReady = loadFrame(dotIndex).then(renderFrame);
+}
+
+function renderFrame(depgraph) {
     var dot = depgraph.dot;
     // Update Top Bar Data immediately
     d3.select("#timestamp").text(depgraph.timestamp);
@@ -234,20 +604,25 @@ function render() {
     // Update Contributors (using D3 join pattern)
     d3.select("#contributors")
         .selectAll("img")
-        .data(depgraph.contributors || [])
+        .data(contributors.slice(0, depgraph.contributor_count))
         .join("img")
         .attr("class", "avatar")
-        .attr("src", d => d.avatar_url)
+        // --offline pages embed the avatars, see offline.py
+        .attr("src", d => d.avatar != null ? avatar_images[d.avatar] : d.avatar_url)
         .attr("title", d => d.login) // Tooltip on hover
         .attr("alt", d => d.login);
 
     graphviz
+        .engine(layout_engine)
         .renderDot(dot)
         .on("end", function () {
             dotIndex += 1;
-            if (dotIndex < dots.length && !paused) {
+            if (dotIndex === startIndex) {
+                document.body.setAttribute("data-ready", "true");
+            }
+            if (dotIndex < stopIndex && !paused) {
                 setTimeout(render, 5);
-            } else if (dotIndex >= dots.length) {
+            } else if (dotIndex >= stopIndex) {
                 document.body.setAttribute("data-finished", "true");
             }
         });
@@ -255,22 +630,214 @@ function render() {
 
 """
 
-def construct_html(depgraphs, repo_title, outfile):
+FRAME_ENCODINGS = ["delta", "full"]
+
+def js_literal(value):
+    """Returns value as a JavaScript literal that is safe inside a <script> element."""
+    return json.dumps(value).replace("</", "<\\/")
+
+def encode_deltas(dots):
+    """
+    Delta-encodes a sequence of canonical DOT strings line by line. Returns
+    the table of distinct lines and, for every DOT, the list of
+    (start, delete_count, line_ids) splices that turn the previous DOT's line
+    IDs into its own when applied in order. fix_up_dot puts every node and
+    edge on its own line, so the splices are exactly the added, removed and
+    changed nodes and edges.
+    """
+    line_ids = {}
+    deltas = []
+    previous = []
+    for dot in dots:
+        current = [line_ids.setdefault(line, len(line_ids)) for line in dot.split("\n")]
+        matcher = difflib.SequenceMatcher(None, previous, current, autojunk=False)
+        # Splicing from the end keeps the start positions of earlier ops valid.
+        delta = [(i1, i2 - i1, current[j1:j2])
+                 for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes())
+                 if tag != "equal"]
+        deltas.append(delta)
+        previous = current
+    return list(line_ids), deltas
+
+# Frames per chunk file of --frame-store
+FRAME_CHUNK_SIZE = 50
+
+def construct_html(depgraphs, repo_title, outfile, contributors=(), frame_encoding="delta",
+                   layout_engine="dot", frame_store=None, offline_cache=None, append=False):
+    """
+    Writes the animation page to outfile. With frame_store, a directory next
+    to outfile, the frames are written there in chunks (see write_frame_store)
+    for the page to load as it plays, and depgraphs may be any iterable, which
+    is consumed a chunk at a time; with append, they are added to the frames
+    already there. With offline_cache, a directory, the page
+    embeds its scripts and avatars (see offline.py). Returns the number of
+    frames.
+    """
+    if frame_store:
+        frame_count = write_frame_store(depgraphs, frame_store, append=append)
+    else:
+        depgraphs = list(depgraphs)
+        frame_count = len(depgraphs)
+    header = OUTPUT_HEADER
+    avatar_images, avatar_indices = [], [None] * len(contributors)
+    if offline_cache:
+        header = offline.inline_scripts(header, offline_cache)
+        avatar_images, avatar_indices = offline.embed_avatars(
+            [contributor["avatar_url"] for contributor in contributors], offline_cache)
     with open(outfile, "w", encoding="utf-8") as f:
-        f.write(OUTPUT_HEADER)
+        f.write(header)
         f.write('var repo_title = "{}"\n'.format(repo_title))
+        f.write('var layout_engine = "{}";\n'.format(layout_engine))
+        f.write("var frame_count = {};\n".format(frame_count))
+        f.write("var avatar_images = [\n")
+        for image in avatar_images:
+            f.write(js_literal(image) + ",\n")
+        f.write("];\n")
+        f.write("var contributors = [\n")
+        for contributor, avatar in zip(contributors, avatar_indices):
+            entry = {key: contributor[key] for key in ("login", "avatar_url", "html_url")}
+            if avatar is not None:
+                entry["avatar"] = avatar
+            f.write(js_literal(entry) + ",\n")
+        f.write("];\n")
+        if frame_store:
+            store = {"path": os.path.relpath(frame_store, os.path.dirname(os.path.abspath(outfile))) + "/",
+                     "chunk_size": FRAME_CHUNK_SIZE}
+            f.write("var frame_store = {};\n".format(js_literal(store)))
+            f.write("</script>\n")
+            return frame_count
+        if frame_encoding == "delta":
+            lines, deltas = encode_deltas([depgraph.dot for depgraph in depgraphs])
+            f.write("var dot_lines = [\n")
+            for line in lines:
+                f.write(js_literal(line) + ",\n")
+            f.write("];\n")
         f.write("var dots = [\n")
-        for depgraph in depgraphs:
-            f.write('{"dot": `')
-            f.write(depgraph.dot)
-            f.write("`,\n")
+        for i, depgraph in enumerate(depgraphs):
+            if frame_encoding == "delta":
+                f.write('{{"delta": {},\n'.format(json.dumps(deltas[i], separators=(",", ":"))))
+            else:
+                f.write('{"dot": `')
+                f.write(depgraph.dot)
+                f.write("`,\n")
             f.write('"timestamp": "{}",\n'.format(
                 depgraph.commit.timestamp.strftime('%Y-%m-%d %H:%M:%S')))
-            f.write('"contributors": {} }},\n'.format(depgraph.contributors))
+            f.write('"contributor_count": {} }},\n'.format(depgraph.contributor_count))
         f.write("];\n")
         f.write("</script>\n")
+    return frame_count
+
+def frame_record(depgraph):
+    """Returns the frame of depgraph as written by export_frames."""
+    return {
+        "timestamp": depgraph.commit.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+        "contributor_count": depgraph.contributor_count,
+        "dot": depgraph.dot,
+    }
+
+def chunk_path(directory, index):
+    return os.path.join(directory, "chunk-{:05d}.ndjson.gz".format(index))
+
+def read_chunk(path):
+    """Returns the frames of a chunk written by write_frame_store, as frame_record dicts."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        lines = json.loads(f.readline())["lines"]
+        frames = [json.loads(line) for line in f if line.strip()]
+    current = []
+    for frame in frames:
+        for start, delete_count, line_ids in frame.pop("delta"):
+            current[start:start + delete_count] = line_ids
+        frame["dot"] = "\n".join(lines[i] for i in current)
+    return frames
+
+def frame_store_tail(directory, chunk_size=FRAME_CHUNK_SIZE):
+    """
+    Returns the number of frames in the frame store in directory and the
+    frames of its last chunk (as frame_record dicts), or (0, []) if there is
+    no store.
+    """
+    if not os.path.isdir(directory):
+        return 0, []
+    chunk_count = len([name for name in os.listdir(directory) if name.endswith(".ndjson.gz")])
+    if chunk_count == 0:
+        return 0, []
+    last = read_chunk(chunk_path(directory, chunk_count - 1))
+    return (chunk_count - 1) * chunk_size + len(last), last
+
+def write_frame_store(depgraphs, directory, chunk_size=FRAME_CHUNK_SIZE, append=False):
+    """
+    Writes depgraphs to directory as gzipped NDJSON files chunk-00000.ndjson.gz,
+    ... of chunk_size frames each. Every chunk is delta-encoded on its own
+    (a {"lines": [...]} line, then one line per frame), so the player can
+    decode it without the chunks before it. With append, the frames are added
+    after those already in directory, and only its last chunk is rewritten.
+    Returns the number of frames in the store.
+    """
+    count, chunk = 0, []
+    if append:
+        count, chunk = frame_store_tail(directory, chunk_size)
+        if len(chunk) == chunk_size:
+            chunk = []
+    else:
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+    os.makedirs(directory, exist_ok=True)
+
+    def write_chunk(index, chunk):
+        lines, deltas = encode_deltas([frame["dot"] for frame in chunk])
+        path = chunk_path(directory, index)
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"lines": lines}) + "\n")
+            for frame, delta in zip(chunk, deltas):
+                f.write(json.dumps({
+                    "timestamp": frame["timestamp"],
+                    "contributor_count": frame["contributor_count"],
+                    "delta": delta,
+                }, separators=(",", ":")) + "\n")
+        # A page being played never sees a half-written chunk.
+        os.replace(path + ".tmp", path)
+
+    added = 0
+    for depgraph in depgraphs:
+        chunk.append(frame_record(depgraph))
+        count += 1
+        added += 1
+        if len(chunk) == chunk_size:
+            write_chunk((count - 1) // chunk_size, chunk)
+            chunk = []
+    if chunk and added:
+        write_chunk((count - 1) // chunk_size, chunk)
+    return count
+
+def export_frames(depgraphs, repo_title, outfile, contributors=(), layout_engine="dot"):
+    """
+    Writes the frames as JSON lines for render_video.py: a header with the
+    title, layout engine and contributor table, then one line per frame.
+    """
+    with open(outfile, "w", encoding="utf-8") as f:
+        header = {
+            "repo_title": repo_title,
+            "layout_engine": layout_engine,
+            "contributors": [{key: c[key] for key in ("login", "avatar_url", "html_url")}
+                             for c in contributors],
+        }
+        f.write(json.dumps(header) + "\n")
+        for depgraph in depgraphs:
+            f.write(json.dumps(frame_record(depgraph)) + "\n")
 
 def fix_up_dot(dot):
+    """
+    Returns dot in a stable canonical form with its nodes sorted by name, so
+    that equal graphs compare equal as strings.
+    """
+    try:
+        return dot_canon.canonicalize(dot)
+    except dot_canon.UnsupportedDot as e:
+        print(f"Canonicalizing with pydot instead: {e}")
+        return fix_up_dot_pydot(dot)
+
+def fix_up_dot_pydot(dot):
+    """Reference implementation of fix_up_dot, also used for input dot_canon cannot handle."""
     graphs = pydot.graph_from_dot_data(dot)
     original_g = graphs[0]
 
@@ -305,47 +872,134 @@ def fix_up_dot(dot):
     for subgraph in original_g.get_subgraphs():
         new_g.add_subgraph(subgraph)
 
-    print(new_g.to_string())
     return new_g.to_string()
 
-# function to clone the github repo with owner and repo name, to a subdirectory of repos/
-# create repos/ if it does not exist
-def clone_repo(github_owner, github_repo):
+# Directories checked out by --sparse-checkout clones. Cone mode also checks
+# out the files at the top level of the repository.
+SPARSE_CHECKOUT_DIRS = ["blueprint"]
+
+def clone_repo(github_owner, github_repo, partial=False, sparse=False, shallow_since=None):
+    """
+    Clones the repository into repos/, or updates an existing clone.
+    partial makes a blob-less partial clone, which downloads file contents
+    only when they are needed; sparse checks out only SPARSE_CHECKOUT_DIRS;
+    shallow_since (YYYY-MM-DD) leaves out history before that date.
+    """
     repos_dir = "repos"
     os.makedirs(repos_dir, exist_ok=True)
     repo_dir = os.path.join(repos_dir, github_repo)
 
+    shallow_args = [f"--shallow-since={shallow_since}"] if shallow_since else []
     if not os.path.exists(repo_dir):
         print(f"Cloning {github_owner}/{github_repo} into {repo_dir}")
-        subprocess.run(["git", "clone", f"https://github.com/{github_owner}/{github_repo}.git", repo_dir])
+        clone_args = shallow_args + (["--filter=blob:none"] if partial else []) + (["--sparse"] if sparse else [])
+        subprocess.run(["git", "clone", *clone_args,
+                        f"https://github.com/{github_owner}/{github_repo}.git", repo_dir])
     else:
         print(f"Repository {repo_dir} already exists.")
         # fetch and pull the latest changes
-        subprocess.run(["git", "-C", repo_dir, "fetch"])
+        subprocess.run(["git", "-C", repo_dir, "fetch", *shallow_args])
         subprocess.run(["git", "-C", repo_dir, "pull"])
+    if sparse:
+        subprocess.run(["git", "-C", repo_dir, "sparse-checkout", "set", *SPARSE_CHECKOUT_DIRS])
     return repo_dir
 
+def sparse_checkout_dirs(repo_path):
+    """Returns the sparse checkout directories of repo_path, or None if it checks out everything."""
+    result = subprocess.run(["git", "config", "--bool", "core.sparseCheckout"],
+                            cwd=repo_path, capture_output=True, text=True)
+    if result.stdout.strip() != "true":
+        return None
+    return subprocess.run(["git", "sparse-checkout", "list"], cwd=repo_path,
+                          capture_output=True, text=True, check=True).stdout.split()
 
-def main():
-    parser = argparse.ArgumentParser(description="Serve blueprint and save SVG")
+def is_partial_clone(repo_path):
+    result = subprocess.run(["git", "config", "--bool", "remote.origin.promisor"],
+                            cwd=os.path.expanduser(repo_path), capture_output=True, text=True)
+    return result.stdout.strip() == "true"
+
+def missing_blueprint_blobs(repo_path, commit_ids):
+    """
+    Returns the IDs of the blueprint files of commit_ids that are not in the
+    clone yet. Only the blueprint trees of these commits are listed, not the
+    history behind them.
+    """
+    trees = "".join(f"{commit_id}:{directory}\n" for commit_id in commit_ids
+                    for directory in SPARSE_CHECKOUT_DIRS)
+    # --ignore-missing skips commits without a blueprint directory.
+    listing = subprocess.run(["git", "rev-list", "--objects", "--ignore-missing", "--missing=print", "--stdin"],
+                             cwd=os.path.expanduser(repo_path), input=trees,
+                             capture_output=True, text=True, check=True).stdout
+    return [line[1:] for line in listing.splitlines() if line.startswith("?")]
+
+def prefetch_blueprint_blobs(repo_path, commit_ids):
+    """
+    In a partial clone, downloads the blueprint files of all commit_ids in a
+    single fetch, rather than one lazy fetch per checkout or object read.
+    Does nothing in a full clone.
+    """
+    repo_path = os.path.expanduser(repo_path)
+    if not commit_ids or not is_partial_clone(repo_path):
+        return
+    missing = missing_blueprint_blobs(repo_path, commit_ids)
+    if not missing:
+        return
+    print(f"Fetching {len(missing)} blueprint files")
+    # The same request git makes when it lazily fetches a missing object.
+    subprocess.run(["git", "-c", "fetch.negotiationAlgorithm=noop", "fetch", "-q", "--no-tags",
+                    "--no-write-fetch-head", "--recurse-submodules=no", "--filter=blob:none",
+                    "origin", "--stdin"],
+                   cwd=repo_path, input="".join(f"{sha}\n" for sha in missing), text=True, check=True)
+
+
+def add_build_arguments(parser):
+    """Adds the options of main.py other than the repository to parser."""
     parser.add_argument("--output", type=str, default="output", help="Output directory")
-    parser.add_argument("--repo-url", type=str, default="https://github.com/jcreedcmu/Noperthedron", help="URL of the project on github")
     parser.add_argument("--rev", type=str, default="main", help="Git revision to list commits from")
     parser.add_argument("--start-date", type=str, default="1970-01-01", help="Start date for listing commits (YYYY-MM-DD)")
-    args = parser.parse_args()
+    parser.add_argument("--partial-clone", action="store_true",
+                        help="Clone without file contents (--filter=blob:none) and download only the ones that are needed")
+    parser.add_argument("--sparse-checkout", action="store_true",
+                        help="Check out only blueprint/ (and top-level files) in the clone and the build worktrees")
+    parser.add_argument("--shallow", action="store_true", help="Clone only the history since --start-date")
+    parser.add_argument("--cache-dir", type=str, default="cache", help="Directory for the persistent DOT cache")
+    parser.add_argument("--no-cache", action="store_true", help="Always rebuild, without reading or writing the DOT cache")
+    parser.add_argument("--history-listed-only", action="store_true",
+                        help="Fetch GitHub data only for commits that touched blueprint/ instead of the whole branch history (contributors of other commits are then not shown)")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of commits to build in parallel, each in its own git worktree")
+    parser.add_argument("--extractor", choices=EXTRACTORS, default="leanblueprint",
+                        help="How to get each commit's dependency graph: run leanblueprint web, render it in a warm plasTeX worker, or parse the LaTeX sources directly")
+    parser.add_argument("--max-frames", type=int,
+                        help="Build at most this many commits, chosen where the graph changes most (at least 2)")
+    parser.add_argument("--resume", action="store_true", help="Skip commits already recorded in the checkpoint journal of a previous run")
+    parser.add_argument("--precompute-layout", action="store_true",
+                        help="Lay out the frames with Graphviz here (in parallel, see --jobs) instead of in the browser")
+    parser.add_argument("--global-layout", action="store_true",
+                        help="Lay out the union of all frames once with Graphviz and keep every node at its place in it")
+    parser.add_argument("--offline", action="store_true",
+                        help="Make a page that loads nothing from the network: inline the scripts and embed small copies of the avatars, cached in --cache-dir")
+    parser.add_argument("--export-frames", action="store_true",
+                        help="Also write the frames to <output>/<repo>.frames.jsonl for render_video.py")
+    parser.add_argument("--profile-commit", type=str, default=None,
+                        help="Run the build of this commit (ID or prefix) under cProfile and save the stats in the output directory")
+    parser.add_argument("--frame-store", action="store_true",
+                        help="Write the frames to gzipped chunks in output/<repo>.chunks/ that the page loads as it plays")
+    parser.add_argument("--frame-encoding", choices=FRAME_ENCODINGS, default="delta",
+                        help="Store each frame as line changes against the previous one, or as its full DOT text")
 
-    output_directory = os.path.expanduser(args.output)
-    os.makedirs(output_directory, exist_ok=True)
+def check_build_arguments(parser, args):
+    if args.max_frames is not None and args.max_frames < 2:
+        parser.error("--max-frames must be at least 2")
 
-    # extract github_owner and github_repo from args.repo_url
+def parse_repo_url(repo_url):
+    """Returns the GitHub owner and repository name of repo_url."""
     pattern = r'github\.com[:/]+([^/]+)/([^/]+?)(?:\.git)?$'
-    match = re.search(pattern, args.repo_url)
-    if match:
-        github_owner, github_repo = match.groups()
-        print(f"GitHub Owner: {github_owner}, Repo: {github_repo}")
-    else:
-        raise Exception("❌ Could not parse owner and repo name from URL.")
-    
+    match = re.search(pattern, repo_url)
+    if not match:
+        raise Exception(f"❌ Could not parse owner and repo name from URL {repo_url}.")
+    return match.groups()
+
+def require_github_token():
     if not os.getenv("GITHUB_TOKEN"):
         raise SystemExit(
             "Error: GITHUB_TOKEN environment variable is not set.\n"
@@ -354,32 +1008,171 @@ def main():
             "  export GITHUB_TOKEN=your_token_here"
         )
 
-    revision_history_by_hash = get_collaborators.get_revision_history_by_hash(
-        github_owner, github_repo, args.rev)
+def main():
+    parser = argparse.ArgumentParser(description="Serve blueprint and save SVG")
+    parser.add_argument("--repo-url", type=str, default="https://github.com/jcreedcmu/Noperthedron", help="URL of the project on github")
+    add_build_arguments(parser)
+    args = parser.parse_args()
+    check_build_arguments(parser, args)
 
-    repo_path = clone_repo(github_owner, github_repo)
-    commits = list_commits_chronologically(repo_path, args.rev, args.start_date)
+    output_directory = os.path.expanduser(args.output)
+    os.makedirs(output_directory, exist_ok=True)
+    cache_dir = None if args.no_cache else os.path.expanduser(args.cache_dir)
 
-    depgraphs = []
-    ii = 0
-    for commit in commits:
-        print("commit ID:", commit.commit_id)
-        dot = get_depgraph(repo_path, commit.commit_id)
-        revision_info = revision_history_by_hash[commit.commit_id]
-        if dot:
-            dot = fix_up_dot(dot)
-            if len(depgraphs) > 0 and depgraphs[-1].dot == dot:
-                pass
-            else:
-                contributors = list(filter(lambda c: c['type'] == 'github_user',
-                                           revision_info["contributors"]))
-                print("contribs = ", contributors)
-                depgraphs.append(DepGraph(dot=dot, commit=commit,
-                                          contributors=contributors))
-        ii += 1
+    github_owner, github_repo = parse_repo_url(args.repo_url)
+    print(f"GitHub Owner: {github_owner}, Repo: {github_repo}")
+    require_github_token()
+
+    # Timings of every stage, including those in worker processes, are
+    # collected while the animation is built and summarized next to it.
+    records_dir = tempfile.mkdtemp(prefix="blueprint-timings-")
+    instrument.enable(records_dir, profile_commit=args.profile_commit, profile_dir=output_directory)
+    try:
+        animate_repo(args, github_owner, github_repo, output_directory, cache_dir)
+    finally:
+        instrument.write_report(records_dir, os.path.join(output_directory, f"{github_repo}.timings.json"))
+        shutil.rmtree(records_dir, ignore_errors=True)
+
+def shown_contributors(all_contributors):
+    """
+    Returns the contributors shown in the page, and for every prefix length
+    of all_contributors the number of them it contains. Only GitHub users are
+    shown. Their table is written to the HTML once, and each frame shows the
+    ones who had contributed by its commit.
+    """
+    contributors = [c for c in all_contributors if c['type'] == 'github_user']
+    github_users_before = [0]
+    for c in all_contributors:
+        github_users_before.append(github_users_before[-1] + (c['type'] == 'github_user'))
+    return contributors, github_users_before
+
+def select_frames(commits, dots, revision_history_by_hash, github_users_before, previous=None):
+    """
+    Yields a DepGraph for every commit whose build succeeded and whose graph
+    differs from the previous frame's, starting from the DOT previous.
+    """
+    for commit, dot in zip(commits, dots):
+        if dot and dot != previous:
+            revision_info = revision_history_by_hash[commit.commit_id]
+            contributor_count = github_users_before[revision_info["contributor_count"]]
+            yield DepGraph(dot=dot, commit=commit, contributor_count=contributor_count)
+            previous = dot
+
+def animate_repo(args, github_owner, github_repo, output_directory, cache_dir, pool=None):
+    """
+    Builds the animation of the repository for the options in args, as
+    parsed by main(), with the builds running in pool if given (see
+    build_depgraphs). Returns the number of commits built and of frames, and
+    the path of the page.
+    """
+    # The GitHub history is fetched in a thread while the repository is cloned
+    # and the commits are built; it is only needed once all frames are built.
+    listed_shas = Future()
+
+    def fetch_history():
+        with instrument.stage("graphql_fetch"):
+            return get_collaborators.get_revision_history_by_hash(
+                github_owner, github_repo, args.rev, cache_dir=cache_dir,
+                shas=listed_shas, listed_only=args.history_listed_only)
+
+    with ThreadPoolExecutor(max_workers=1) as history_executor:
+        history_future = history_executor.submit(fetch_history)
+        try:
+            with instrument.stage("clone"):
+                repo_path = clone_repo(github_owner, github_repo, partial=args.partial_clone,
+                                       sparse=args.sparse_checkout,
+                                       shallow_since=args.start_date if args.shallow else None)
+
+            # Commits are built as soon as git lists them.
+            listed_commits = []
+            def listing():
+                for commit in iter_commits_chronologically(repo_path, args.rev, args.start_date):
+                    listed_commits.append(commit)
+                    yield commit
+                listed_shas.set_result([commit.commit_id for commit in listed_commits])
+            commits = iter_distinct_commits(listing())
+            if args.max_frames or is_partial_clone(repo_path):
+                # Sampling and the blob prefetch need all commits up front.
+                with instrument.stage("list_commits"):
+                    commits = list(commits)
+
+            # Every finished commit goes to an append-only journal next to the output,
+            # so an interrupted run can pick up where it left off with --resume.
+            journal_file = checkpoint.journal_path(output_directory, github_repo)
+            completed = checkpoint.load_journal(journal_file) if args.resume else {}
+            dots_by_commit = checkpoint.built_dots(completed)
+            if args.resume:
+                print(f"Resuming: {len(dots_by_commit)} commits already built")
+
+            with checkpoint.open_journal(journal_file, args.resume) as journal, instrument.stage("build_all"):
+                def build(batch):
+                    """Builds the commits of batch, an iterable, and returns them and their DOTs."""
+                    if isinstance(batch, list):
+                        with instrument.stage("prefetch_blobs"):
+                            prefetch_blueprint_blobs(repo_path, [commit.commit_id for commit in batch
+                                                                 if commit.commit_id not in dots_by_commit])
+                    seen = []
+                    pending = []
+                    def pending_commits():
+                        for commit in batch:
+                            seen.append(commit)
+                            if commit.commit_id not in dots_by_commit:
+                                pending.append(commit)
+                                yield commit
+                    built = build_depgraphs(repo_path, pending_commits(), cache_dir, args.jobs,
+                                            on_result=lambda commit, dot: checkpoint.record(journal, commit, dot),
+                                            extractor=args.extractor, pool=pool)
+                    dots_by_commit.update(zip((commit.commit_id for commit in pending), built))
+                    return seen, [dots_by_commit[commit.commit_id] for commit in seen]
+
+                if args.max_frames:
+                    with ExitStack() as stack:
+                        if pool is None and (args.jobs > 1 or args.extractor == "plastex"):
+                            # One set of workers and worktrees for all sampling rounds.
+                            pool = stack.enter_context(build_pool(args.jobs, args.extractor))
+                        commits, dots = sampling.sample_commits(commits, args.max_frames,
+                                                                lambda batch: build(batch)[1],
+                                                                batch_size=args.jobs)
+                else:
+                    commits, dots = build(commits)
+        except BaseException as e:
+            if not listed_shas.done():
+                listed_shas.set_exception(e)
+            raise
+
+        revision_history_by_hash, all_contributors = history_future.result()
+
+    contributors, github_users_before = shown_contributors(all_contributors)
+    depgraphs = select_frames(commits, dots, revision_history_by_hash, github_users_before)
+    if not args.frame_store or args.precompute_layout or args.global_layout or args.export_frames:
+        depgraphs = list(depgraphs)
+
+    layout_engine = "dot"
+    if args.global_layout:
+        print(f"Computing one layout for all {len(depgraphs)} frames")
+        with instrument.stage("global_layout"):
+            dots = layout.precompute_union_layout([depgraph.dot for depgraph in depgraphs])
+    elif args.precompute_layout:
+        print(f"Precomputing layouts of {len(depgraphs)} frames")
+        with instrument.stage("precompute_layout"):
+            dots = layout.precompute_layouts([depgraph.dot for depgraph in depgraphs], args.jobs)
+    if args.global_layout or args.precompute_layout:
+        for depgraph, dot in zip(depgraphs, dots):
+            depgraph.dot = dot
+        layout_engine = layout.PINNED_ENGINE
 
     repo_title = github_owner + "/" + github_repo
-    construct_html(depgraphs, repo_title, os.path.join(args.output, "{}.html".format(github_repo)))
+    frame_store = os.path.join(args.output, "{}.chunks".format(github_repo)) if args.frame_store else None
+    html_path = os.path.join(args.output, "{}.html".format(github_repo))
+    with instrument.stage("construct_html"):
+        frame_count = construct_html(depgraphs, repo_title, html_path, contributors=contributors,
+                                     frame_encoding=args.frame_encoding, layout_engine=layout_engine,
+                                     frame_store=frame_store,
+                                     offline_cache=os.path.expanduser(args.cache_dir) if args.offline else None)
+    if args.export_frames:
+        export_frames(depgraphs, repo_title, os.path.join(args.output, "{}.frames.jsonl".format(github_repo)),
+                      contributors=contributors, layout_engine=layout_engine)
+    return {"commits": len(commits), "frames": frame_count, "html": html_path}
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,88 @@
+"""
+Self-contained pages for `main.py --offline`.
+
+The player normally loads d3, the Graphviz WASM build and d3-graphviz from
+CDNs and shows contributors' avatars straight from GitHub. For --offline
+pages, the scripts are downloaded once into <cache>/vendor and inlined (the
+@hpcc-js/wasm bundle carries its WASM binary inside the script), and the
+avatars are downloaded once into <cache>/avatars, scaled down to the size
+they are shown at and embedded as data URIs, each distinct image once. The
+page then loads nothing from the network.
+"""
+import base64
+import hashlib
+import io
+import os
+import re
+
+from PIL import Image
+import requests
+
+# Width and height of the embedded avatars in pixels: twice their size in
+# the player at 1080p, so they stay sharp on high-density screens.
+AVATAR_PIXELS = 72
+
+SCRIPT_TAG_RE = re.compile(r'<script src="(https://[^"]+)"></script>')
+
+def download(url):
+    response = requests.get(url, timeout=60)
+    response.raise_for_status()
+    return response.content
+
+def cached_file(cache_dir, subdir, url, make_content):
+    """
+    Returns the content cached for url in cache_dir/subdir, calling
+    make_content() to create it on the first call.
+    """
+    directory = os.path.join(cache_dir, subdir)
+    path = os.path.join(directory, hashlib.sha256(url.encode("utf-8")).hexdigest())
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+    content = make_content()
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return content
+
+def inline_scripts(html, cache_dir):
+    """Returns html with every <script src="https://..."> replaced by the script itself."""
+    def inline(match):
+        url = match.group(1)
+        script = cached_file(cache_dir, "vendor", url, lambda: download(url)).decode("utf-8")
+        # Nothing in the script may end the <script> element early.
+        return "<script>" + re.sub(r"</(script)", r"<\\/\1", script, flags=re.IGNORECASE) + "</script>"
+    return SCRIPT_TAG_RE.sub(inline, html)
+
+def resized_avatar(url):
+    image = Image.open(io.BytesIO(download(url)))
+    image = image.convert("RGBA")
+    image.thumbnail((AVATAR_PIXELS, AVATAR_PIXELS), Image.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+def embed_avatars(urls, cache_dir):
+    """
+    Returns the distinct avatar images of urls as data URIs, and for every
+    URL the index of its image in that list, or None for avatars that could
+    not be downloaded (the player then links them instead).
+    """
+    images = []
+    index_by_digest = {}
+    indices = []
+    for url in urls:
+        try:
+            png = cached_file(cache_dir, "avatars", url, lambda: resized_avatar(url))
+        except (requests.RequestException, OSError) as e:
+            print(f"Could not embed the avatar {url}: {e}")
+            indices.append(None)
+            continue
+        digest = hashlib.sha256(png).hexdigest()
+        if digest not in index_by_digest:
+            index_by_digest[digest] = len(images)
+            images.append("data:image/png;base64," + base64.b64encode(png).decode("ascii"))
+        indices.append(index_by_digest[digest])
+    return images, indices
@@ -0,0 +1,109 @@
+"""
+In-process rendering of blueprint dependency graphs.
+
+`leanblueprint web` is a fresh Python process that imports plasTeX and the
+blueprint packages and renders the whole HTML site, only for us to pull one
+DOT string out of dep_graph_document.html. This module instead imports plasTeX
+once, and for every commit only parses the document and asks plastexdepgraph
+for the graph, the same way its make_graph_html does, skipping the renderer.
+
+plasTeX keeps some global state, so long runs should use short-lived worker
+processes (see main.build_depgraphs) rather than one interpreter forever.
+"""
+import importlib
+import os
+import shlex
+import subprocess
+
+import instrument
+import latex_depgraph
+
+# Bump whenever the generated DOT changes, to invalidate cached graphs.
+RENDER_VERSION = "1"
+
+# Imported on first use, so that merely importing this module stays cheap.
+_plastex = None
+
+def _load_plastex():
+    global _plastex
+    if _plastex is None:
+        from plasTeX.Compile import parse
+        from plasTeX.Config import defaultConfig
+        from plasTeX.client import collect_renderer_config
+        # plasTeX only imports the plugins while parsing; import them here so
+        # that a broken install fails the run instead of every commit.
+        for plugin in ["leanblueprint.Packages.blueprint", "plastexdepgraph.Packages.depgraph"]:
+            importlib.import_module(plugin)
+        _plastex = (parse, defaultConfig, collect_renderer_config)
+    return _plastex
+
+def base_config():
+    """Returns a fresh plasTeX configuration, set up like the plastex command does."""
+    _parse, defaultConfig, collect_renderer_config = _load_plastex()
+    config = defaultConfig()
+    collect_renderer_config(config)
+    return config
+
+def render_dot(src_dir, config=None):
+    """
+    Returns the dependency graph DOT of the blueprint in src_dir, as
+    leanblueprint web would embed it in dep_graph_document.html. config is
+    a base_config() to use, by default a new one.
+    """
+    parse = _load_plastex()[0]
+    if config is None:
+        config = base_config()
+    config.read(os.path.join(src_dir, "plastex.cfg"))
+    config["files"]["log"] = False
+
+    cwd = os.getcwd()
+    os.chdir(src_dir)
+    try:
+        document = parse(latex_depgraph.MAIN_FILE, config).ownerDocument
+        with open(latex_depgraph.MAIN_FILE, "r", encoding="utf-8") as f:
+            options = latex_depgraph.parse_package_options(latex_depgraph.strip_comments(f.read()))
+    finally:
+        os.chdir(cwd)
+
+    dep_graph = document.userdata["dep_graph"]
+    graph = dep_graph["graphs"].get(document)
+    if graph is None:
+        print("no document-wide dependency graph!")
+        return None
+    dot = graph.to_dot(dep_graph.get("shapes", {"definition": "box"}))
+    if "nonreducedgraph" not in options:
+        dot = dot.tred()
+    return dot.to_string()
+
+def get_depgraph(repo_path, commit_id):
+    """
+    Like main.get_depgraph, but renders in this process instead of running
+    leanblueprint web. Only errors in rendering the commit's blueprint make
+    it return None; missing packages and plasTeX setup errors are raised.
+    """
+    target_dir = os.path.expanduser(repo_path)
+    config = base_config()
+
+    try:
+        with instrument.stage("git checkout", commit_id):
+            instrument.run(["git", "checkout", commit_id], check=True, cwd=target_dir,
+                           stdin=subprocess.DEVNULL)
+    except subprocess.CalledProcessError as e:
+        print(f"Error checking out {commit_id}: {e}")
+        return None
+
+    try:
+        with instrument.stage("plastex_render", commit_id):
+            return render_dot(os.path.join(target_dir, latex_depgraph.SRC_DIR), config)
+    except ImportError:
+        raise
+    except Exception as e:
+        print(f"Error rendering {commit_id}: {e}")
+        return None
+    finally:
+        # leanblueprint writes blueprint/lean_decls while parsing, so the
+        # checkout still has to be cleaned up like after leanblueprint web.
+        for cmd in ["git reset --hard HEAD", "git clean -f"]:
+            args = shlex.split(cmd)
+            with instrument.stage(" ".join(args[:2]), commit_id):
+                instrument.run(args, cwd=target_dir, stdin=subprocess.DEVNULL)
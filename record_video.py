@@ -2,13 +2,262 @@
 """Record the animated blueprint depgraph HTML page as an MP4 video."""
 
 import argparse
+import base64
+from concurrent.futures import ProcessPoolExecutor
 import os
 import subprocess
 import sys
 import tempfile
+import time
 
 from playwright.sync_api import sync_playwright
 
+from video_encode import FrameWriter, encoder_options
+
+# How long the final frame lingers at the end of the video, in milliseconds
+LINGER_MS = 2000
+
+# Pages written with main.py --frame-store load their frames from files next
+# to them, which Chromium only allows file:// pages to do with this switch.
+BROWSER_ARGS = ["--allow-file-access-from-files"]
+
+# Injected before any page script in --deterministic mode. It replaces the
+# clocks and timers the page sees (performance.now, Date.now, setTimeout,
+# setInterval, requestAnimationFrame) with a virtual clock that only moves
+# when the recorder calls __advanceClock(ms), so d3's transitions advance
+# exactly one video frame per call, however long rendering takes.
+VIRTUAL_CLOCK_JS = """
+(() => {
+    let now = 0;
+    const epoch = Date.now();
+    let nextId = 1;
+    let timers = [];
+    let frameCallbacks = [];
+
+    performance.now = () => now;
+    Date.now = () => epoch + now;
+
+    function addTimer(fn, delay, args, repeat) {
+        const id = nextId++;
+        delay = Math.max(0, Number(delay) || 0);
+        timers.push({id, at: now + delay, fn, args, repeat: repeat ? Math.max(delay, 1) : 0});
+        return id;
+    }
+    function removeTimer(id) {
+        timers = timers.filter(t => t.id !== id);
+    }
+    window.setTimeout = (fn, delay, ...args) => addTimer(fn, delay, args, false);
+    window.setInterval = (fn, delay, ...args) => addTimer(fn, delay, args, true);
+    window.clearTimeout = removeTimer;
+    window.clearInterval = removeTimer;
+    window.requestAnimationFrame = fn => {
+        const id = nextId++;
+        frameCallbacks.push({id, fn});
+        return id;
+    };
+    window.cancelAnimationFrame = id => {
+        frameCallbacks = frameCallbacks.filter(c => c.id !== id);
+    };
+
+    window.__advanceClock = ms => {
+        const target = now + ms;
+        for (;;) {
+            let due = null;
+            for (const t of timers) {
+                if (t.at <= target && (due === null || t.at < due.at)) {
+                    due = t;
+                }
+            }
+            if (due === null) {
+                break;
+            }
+            now = Math.max(now, due.at);
+            if (due.repeat) {
+                due.at += due.repeat;
+            } else {
+                removeTimer(due.id);
+            }
+            if (typeof due.fn === "function") {
+                due.fn(...due.args);
+            }
+        }
+        now = target;
+        const callbacks = frameCallbacks;
+        frameCallbacks = [];
+        for (const c of callbacks) {
+            c.fn(now);
+        }
+    };
+})();
+"""
+
+
+def advance_clock(page, ms):
+    """
+    Advances the virtual clock by ms once the frame the player is loading
+    (e.g. a chunk of a --frame-store page) has arrived and started rendering.
+    """
+    page.evaluate(f"Promise.resolve(window.__frameReady).then(() => __advanceClock({ms}))")
+
+
+def wait_for_animation(page):
+    """Polls the player until it has shown every frame, displaying a progress bar."""
+    total = page.evaluate("frame_count")
+    bar_width = 40
+    poll_ms = 250
+    while True:
+        current = page.evaluate("dotIndex")
+        frac = current / total if total > 0 else 0
+        filled = int(bar_width * frac)
+        bar = "#" * filled + "-" * (bar_width - filled)
+        print(f"\rRecording: [{bar}] {current}/{total} frames", end="", flush=True)
+        if current >= total:
+            break
+        page.wait_for_timeout(poll_ms)
+    print()  # newline after progress bar
+
+
+def record_streaming(file_url, output_path, width, height, fps, encoder_args):
+    """
+    Records the animation in real time from Chromium's screencast, passing
+    the frames straight to ffmpeg without an intermediate file.
+    """
+    writer = FrameWriter(output_path, fps, encoder_args, input_codec="mjpeg")
+    # The screencast only sends a frame when the page repaints. To get a
+    # constant frame rate, the latest frame is repeated for every 1/fps slot
+    # until the next one arrives.
+    state = {"start": None, "frame": None, "slots": 0}
+
+    def fill_until(timestamp):
+        slots = int((timestamp - state["start"]) * fps)
+        while state["slots"] < slots:
+            writer.write(state["frame"])
+            state["slots"] += 1
+
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(args=BROWSER_ARGS)
+            page = browser.new_page(viewport={"width": width, "height": height})
+            cdp = page.context.new_cdp_session(page)
+
+            def on_frame(params):
+                cdp.send("Page.screencastFrameAck", {"sessionId": params["sessionId"]})
+                timestamp = params["metadata"]["timestamp"]
+                if state["start"] is None:
+                    state["start"] = timestamp
+                else:
+                    fill_until(timestamp)
+                state["frame"] = base64.b64decode(params["data"])
+
+            cdp.on("Page.screencastFrame", on_frame)
+            cdp.send("Page.startScreencast", {"format": "jpeg", "quality": 95,
+                                              "maxWidth": width, "maxHeight": height})
+
+            print(f"Opening {file_url} at {width}x{height}")
+            page.goto(file_url)
+            wait_for_animation(page)
+            page.wait_for_timeout(LINGER_MS)
+            cdp.send("Page.stopScreencast")
+            # Screencast timestamps are seconds since the epoch.
+            if state["frame"] is not None:
+                fill_until(time.time())
+            browser.close()
+    finally:
+        writer.close()
+    print(f"Encoded {writer.written} frames")
+
+
+def count_frames(file_url, width, height):
+    with sync_playwright() as p:
+        browser = p.chromium.launch(args=BROWSER_ARGS)
+        page = browser.new_page(viewport={"width": width, "height": height})
+        page.goto(file_url)
+        total = page.evaluate("frame_count")
+        browser.close()
+    return total
+
+
+def record_segment(file_url, start, stop, output_path, width, height, fps, linger, encoder_args):
+    """
+    Records the transitions into frames start to stop - 1 under the virtual
+    clock, one screenshot per video frame, and encodes them to output_path.
+    Returns the number of video frames written.
+    """
+    step_ms = 1000 / fps
+    writer = FrameWriter(output_path, fps, encoder_args)
+    try:
+        with sync_playwright() as p:
+            browser = p.chromium.launch(args=BROWSER_ARGS)
+            page = browser.new_page(viewport={"width": width, "height": height})
+            page.add_init_script(VIRTUAL_CLOCK_JS)
+            page.goto(f"{file_url}?start={start}&stop={stop}")
+
+            # Show frame start - 1 (off camera, but it costs no real time).
+            # The page only gets there once the Graphviz WASM has loaded, so
+            # also let real time pass while waiting.
+            while page.evaluate("document.body.getAttribute('data-ready')") != "true":
+                advance_clock(page, step_ms)
+                page.wait_for_timeout(1)
+
+            # The previous segment ends on frame start - 1, so it is not
+            # repeated here.
+            if start > 0:
+                advance_clock(page, step_ms)
+            while True:
+                png = page.screenshot(type="png")
+                writer.write(png)
+                if page.evaluate("document.body.getAttribute('data-finished')") == "true":
+                    break
+                advance_clock(page, step_ms)
+
+            for _ in range(round(linger / step_ms)):
+                writer.write(png)
+            browser.close()
+    finally:
+        writer.close()
+    return writer.written
+
+
+def record_deterministic(file_url, output_path, width, height, fps, workers, encoder_args):
+    """
+    Records the animation frame by frame under a virtual clock, split into
+    segments that are recorded by separate browser processes in parallel and
+    then joined by ffmpeg.
+    """
+    total = count_frames(file_url, width, height)
+    segments = max(1, min(workers, total))
+    bounds = [round(i * total / segments) for i in range(segments + 1)]
+    print(f"Recording {total} frames in {segments} segments at {fps} fps")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        segment_paths = [os.path.join(tmpdir, f"segment-{i:04d}.mp4") for i in range(segments)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(record_segment, file_url, bounds[i], bounds[i + 1],
+                                segment_paths[i], width, height, fps,
+                                LINGER_MS if i == segments - 1 else 0, encoder_args)
+                for i in range(segments)
+            ]
+            for i, future in enumerate(futures):
+                written = future.result()
+                print(f"Segment {i + 1}/{segments}: frames {bounds[i]}-{bounds[i + 1] - 1}, "
+                      f"{written} video frames")
+
+        list_path = os.path.join(tmpdir, "segments.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for path in segment_paths:
+                f.write(f"file '{path}'\n")
+        print(f"Joining segments: {output_path}")
+        subprocess.run(
+            [
+                "ffmpeg", "-y",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-c", "copy",
+                output_path,
+            ],
+            check=True,
+        )
+
 
 def main():
     parser = argparse.ArgumentParser(description="Record animated depgraph HTML as MP4")
@@ -16,7 +265,18 @@ def main():
     parser.add_argument("-o", "--output", default="output.mp4", help="Output MP4 file path")
     parser.add_argument("--width", type=int, default=1920, help="Video width in pixels")
     parser.add_argument("--height", type=int, default=1080, help="Video height in pixels")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="Step the animation on a virtual clock and capture every video frame, instead of recording in real time")
+    parser.add_argument("--stream", action="store_true",
+                        help="Record in real time, piping the screencast frames straight into ffmpeg instead of going through a WebM file")
+    parser.add_argument("--fps", type=int, default=30, help="Frames per second with --deterministic or --stream")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Browser processes recording segments in parallel with --deterministic")
+    parser.add_argument("--codec", default="libx264", help="ffmpeg video encoder")
+    parser.add_argument("--crf", type=int, default=23, help="Constant rate factor (lower is better quality)")
+    parser.add_argument("--preset", default="medium", help="Encoder preset (speed versus compression)")
     args = parser.parse_args()
+    encoder_args = encoder_options(args.codec, args.crf, args.preset)
 
     html_path = os.path.abspath(args.html_file)
     if not os.path.isfile(html_path):
@@ -25,11 +285,23 @@ def main():
 
     file_url = f"file://{html_path}"
 
+    if args.deterministic:
+        output_path = os.path.abspath(args.output)
+        record_deterministic(file_url, output_path, args.width, args.height, args.fps,
+                             max(1, args.workers), encoder_args)
+        print(f"Done! Video saved to {output_path}")
+        return
+    if args.stream:
+        output_path = os.path.abspath(args.output)
+        record_streaming(file_url, output_path, args.width, args.height, args.fps, encoder_args)
+        print(f"Done! Video saved to {output_path}")
+        return
+
     with tempfile.TemporaryDirectory() as tmpdir:
         webm_path = os.path.join(tmpdir, "recording.webm")
 
         with sync_playwright() as p:
-            browser = p.chromium.launch()
+            browser = p.chromium.launch(args=BROWSER_ARGS)
             context = browser.new_context(
                 viewport={"width": args.width, "height": args.height},
                 record_video_dir=tmpdir,
@@ -62,23 +334,10 @@ def main():
                 }"""
             )
 
-            # Poll animation progress and display a progress bar
-            total = page.evaluate("dots.length")
-            bar_width = 40
-            poll_ms = 250
-            while True:
-                current = page.evaluate("dotIndex")
-                frac = current / total if total > 0 else 0
-                filled = int(bar_width * frac)
-                bar = "#" * filled + "-" * (bar_width - filled)
-                print(f"\rRecording: [{bar}] {current}/{total} frames", end="", flush=True)
-                if current >= total:
-                    break
-                page.wait_for_timeout(poll_ms)
-            print()  # newline after progress bar
+            wait_for_animation(page)
 
             # Let the final frame linger for a moment
-            page.wait_for_timeout(2000)
+            page.wait_for_timeout(LINGER_MS)
 
             video_path = page.video.path()
             context.close()
@@ -91,8 +350,7 @@ def main():
                 [
                     "ffmpeg", "-y",
                     "-i", video_path,
-                    "-c:v", "libx264",
-                    "-pix_fmt", "yuv420p",
+                    *encoder_args,
                     output_path,
                 ],
                 check=True,
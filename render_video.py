@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Render the depgraph animation as MP4 without a browser.
+
+Reads the frames written by `main.py --export-frames`, lays every frame out
+to SVG with Graphviz, and draws the transitions between consecutive frames
+the way the HTML player animates them: nodes that stay move from their old
+to their new position, new nodes and edges fade in and removed ones fade
+out. The intermediate frames are rasterized with cairosvg in a process pool
+and piped to ffmpeg.
+"""
+
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+from video_encode import FrameWriter, encoder_options
+
+# Timing of the HTML player: each transition waits DELAY_MS, then runs for
+# TRANSITION_MS; the last frame lingers for LINGER_MS.
+DELAY_MS = 250
+TRANSITION_MS = 750
+LINGER_MS = 2000
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+ElementTree.register_namespace("", SVG_NS)
+ElementTree.register_namespace("xlink", XLINK_NS)
+
+TRANSLATE_RE = re.compile(r"translate\(\s*([-\d.eE]+)[\s,]+([-\d.eE]+)\s*\)")
+SCALE_RE = re.compile(r"scale\(\s*([-\d.eE]+)(?:[\s,]+([-\d.eE]+))?\s*\)")
+
+# Fractions of the output height taken by the top and bottom bars
+TOP_BAR = 0.04
+BOTTOM_BAR = 0.05
+
+
+def read_frames(path):
+    """Returns the header and the frames of a frames file written by main.py --export-frames."""
+    with open(path, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        frames = [json.loads(line) for line in f if line.strip()]
+    return header, frames
+
+
+def layout_svg(dot, engine):
+    """Lays out dot with Graphviz and returns the SVG."""
+    # Frames with precomputed layouts pin their nodes, which neato -n keeps.
+    command = [engine, "-Tsvg"] + (["-n"] if engine == "neato" else [])
+    return subprocess.run(command, input=dot, capture_output=True, text=True, check=True).stdout
+
+
+def parse_svg(svg):
+    """
+    Splits a Graphviz SVG into its parts, all in graph coordinates.
+    Returns (bounding box (x, y, width, height), nodes, edges), where nodes
+    maps node names to (center, element) and edges maps edge titles to the
+    list of elements with that title.
+    """
+    root = ElementTree.fromstring(svg)
+    graph = root.find(f"{{{SVG_NS}}}g")
+    transform = graph.get("transform", "")
+    translate = TRANSLATE_RE.search(transform)
+    tx, ty = (float(translate.group(1)), float(translate.group(2))) if translate else (0.0, 0.0)
+    scale = SCALE_RE.search(transform)
+    sx = float(scale.group(1)) if scale else 1.0
+    sy = float(scale.group(2) or scale.group(1)) if scale else 1.0
+    _x, _y, width, height = (float(v) for v in root.get("viewBox").split())
+    bbox = (-tx, -ty, width / sx, height / sy)
+
+    nodes = {}
+    edges = {}
+    for element in graph.findall(f"{{{SVG_NS}}}g"):
+        title = element.findtext(f"{{{SVG_NS}}}title", default="")
+        kind = element.get("class")
+        if kind == "node":
+            nodes[title] = (element_center(element), element)
+        elif kind == "edge":
+            edges.setdefault(title, []).append(element)
+    return bbox, nodes, edges
+
+
+def element_center(element):
+    for child in element:
+        tag = child.tag.split("}")[-1]
+        if tag == "ellipse":
+            return float(child.get("cx")), float(child.get("cy"))
+        if tag == "polygon":
+            points = [tuple(float(v) for v in point.split(","))
+                      for point in child.get("points").split()]
+            return (sum(x for x, _y in points) / len(points),
+                    sum(y for _x, y in points) / len(points))
+        if tag == "text":
+            return float(child.get("x")), float(child.get("y"))
+    return 0.0, 0.0
+
+
+def lerp(a, b, t):
+    return a + (b - a) * t
+
+
+def group(element, opacity=1.0, dx=0.0, dy=0.0):
+    attributes = []
+    if opacity < 1:
+        attributes.append(f'opacity="{opacity:.4f}"')
+    if dx or dy:
+        attributes.append(f'transform="translate({dx:.3f} {dy:.3f})"')
+    return f"<g {' '.join(attributes)}>{ElementTree.tostring(element, encoding='unicode')}</g>"
+
+
+def graph_layers(previous, current, t):
+    """
+    Returns the SVG fragments and the bounding box of the transition from
+    previous to current (as returned by parse_svg) at time t in [0, 1].
+    """
+    bbox, nodes, edges = current
+    if previous is None:
+        previous = (bbox, {}, {})
+    old_bbox, old_nodes, old_edges = previous
+
+    layers = []
+    # Edges are redrawn by every layout, so edges that changed cross-fade
+    # and only those that stayed exactly the same are drawn as they are.
+    old_drawn = {ElementTree.tostring(element) for elements in old_edges.values()
+                 for element in elements}
+    new_drawn = {ElementTree.tostring(element) for elements in edges.values()
+                 for element in elements}
+    for elements in old_edges.values():
+        for element in elements:
+            if ElementTree.tostring(element) not in new_drawn:
+                layers.append(group(element, opacity=1 - t))
+    for elements in edges.values():
+        for element in elements:
+            unchanged = ElementTree.tostring(element) in old_drawn
+            layers.append(group(element, opacity=1.0 if unchanged else t))
+    for name, (_center, element) in old_nodes.items():
+        if name not in nodes:
+            layers.append(group(element, opacity=1 - t))
+    for name, ((x, y), element) in nodes.items():
+        if name in old_nodes:
+            (old_x, old_y), _old = old_nodes[name]
+            layers.append(group(element, dx=(old_x - x) * (1 - t), dy=(old_y - y) * (1 - t)))
+        else:
+            layers.append(group(element, opacity=t))
+    view = tuple(lerp(a, b, t) for a, b in zip(old_bbox, bbox))
+    return layers, view
+
+
+def frame_svg(layers, view, width, height, title, timestamp, contributors):
+    """Composes one video frame: the top bar, the graph fitted in between, and the contributors."""
+    top = round(height * TOP_BAR)
+    bottom = round(height * BOTTOM_BAR)
+    graph_height = height - top - bottom
+    font = top * 0.55
+    names = escape(", ".join(contributors))
+    x, y, w, h = view
+    return (
+        f'<svg xmlns="{SVG_NS}" xmlns:xlink="{XLINK_NS}" width="{width}" height="{height}">'
+        f'<rect width="{width}" height="{height}" fill="white"/>'
+        f'<rect width="{width}" height="{top}" fill="#f8f9fa"/>'
+        f'<text x="{top * 0.4}" y="{top * 0.7}" font-family="sans-serif" font-size="{font}">{escape(title)}</text>'
+        f'<text x="{width - top * 0.4}" y="{top * 0.7}" text-anchor="end" font-family="sans-serif" '
+        f'font-size="{font}" font-weight="bold" fill="#333">{escape(timestamp)}</text>'
+        f'<svg x="15" y="{top}" width="{width - 30}" height="{graph_height}" '
+        f'viewBox="{x:.3f} {y:.3f} {w:.3f} {h:.3f}" preserveAspectRatio="xMidYMid meet">'
+        + "".join(layers) +
+        '</svg>'
+        f'<rect y="{height - bottom}" width="{width}" height="{bottom}" fill="#f8f9fa"/>'
+        f'<text x="{top * 0.4}" y="{height - bottom * 0.35}" font-family="sans-serif" font-size="{font * 0.9}" '
+        f'fill="#555"><tspan font-weight="bold">CONTRIBUTORS:</tspan> {names}</text>'
+        '</svg>'
+    )
+
+
+def render_transition(task):
+    """Rasterizes the video frames of one transition. Returns a list of PNGs."""
+    # Imported here so that the rest of this module works without libcairo.
+    import cairosvg
+
+    previous_svg, current_svg, width, height, title, timestamp, contributors, steps, hold = task
+    previous = parse_svg(previous_svg) if previous_svg else None
+    current = parse_svg(current_svg)
+    times = [0.0] * hold + [(i + 1) / steps for i in range(steps)]
+    pngs = []
+    for t in times:
+        layers, view = graph_layers(previous, current, t)
+        svg = frame_svg(layers, view, width, height, title, timestamp, contributors)
+        pngs.append(cairosvg.svg2png(bytestring=svg.encode("utf-8"),
+                                     output_width=width, output_height=height))
+    return pngs
+
+
+def render_video(frames_path, output_path, width, height, fps, workers, encoder_args):
+    header, frames = read_frames(frames_path)
+    engine = header.get("layout_engine", "dot")
+    if shutil.which(engine) is None:
+        raise SystemExit(f"Error: Graphviz `{engine}` is not on PATH.")
+
+    print(f"Laying out {len(frames)} frames with {engine}")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        svgs = list(executor.map(lambda frame: layout_svg(frame["dot"], engine), frames))
+
+    logins = [c["login"] for c in header.get("contributors", [])]
+    steps = max(1, round(TRANSITION_MS * fps / 1000))
+    hold = round(DELAY_MS * fps / 1000)
+    tasks = (
+        (svgs[i - 1] if i > 0 else None, svgs[i], width, height, header["repo_title"],
+         frame["timestamp"], logins[:frame["contributor_count"]], steps, hold)
+        for i, frame in enumerate(frames)
+    )
+
+    writer = FrameWriter(output_path, fps, encoder_args)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Keep only a few transitions in flight, so that rendered frames
+            # do not pile up in memory faster than ffmpeg encodes them.
+            pending = deque()
+            done = 0
+            for task in tasks:
+                pending.append(executor.submit(render_transition, task))
+                if len(pending) >= 2 * workers:
+                    last = write_all(writer, pending.popleft().result())
+                    done += 1
+                    print(f"\rRendered {done}/{len(frames)} transitions", end="", flush=True)
+            while pending:
+                last = write_all(writer, pending.popleft().result())
+                done += 1
+                print(f"\rRendered {done}/{len(frames)} transitions", end="", flush=True)
+            print()
+        if frames:
+            for _ in range(round(LINGER_MS * fps / 1000)):
+                writer.write(last)
+    finally:
+        writer.close()
+
+
+def write_all(writer, pngs):
+    for png in pngs:
+        writer.write(png)
+    return pngs[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the depgraph animation as MP4 without a browser")
+    parser.add_argument("frames_file", help="Frames file written by main.py --export-frames")
+    parser.add_argument("-o", "--output", default="output.mp4", help="Output MP4 file path")
+    parser.add_argument("--width", type=int, default=1920, help="Video width in pixels")
+    parser.add_argument("--height", type=int, default=1080, help="Video height in pixels")
+    parser.add_argument("--fps", type=int, default=30, help="Frames per second")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Processes rasterizing frames in parallel")
+    parser.add_argument("--codec", default="libx264", help="ffmpeg video encoder")
+    parser.add_argument("--crf", type=int, default=23, help="Constant rate factor (lower is better quality)")
+    parser.add_argument("--preset", default="medium", help="Encoder preset (speed versus compression)")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.frames_file):
+        print(f"Error: {args.frames_file} not found")
+        sys.exit(1)
+
+    output_path = os.path.abspath(args.output)
+    render_video(args.frames_file, output_path, args.width, args.height, args.fps,
+                 max(1, args.workers), encoder_options(args.codec, args.crf, args.preset))
+    print(f"Done! Video saved to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Adaptive choice of the commits to build for `main.py --max-frames`.
+
+The first and last commits and evenly spaced ones in between are built
+first. After that, the interval between two consecutive built commits whose
+graphs differ the most (in nodes and edges added, removed or restyled) is
+split at its middle commit, again and again until the frame budget is spent
+or no interval with a change is left to split. Quiet stretches of history
+thus get few frames and busy ones many, and the number of builds is bounded
+by the budget however long the history is.
+"""
+import heapq
+
+import dot_canon
+
+# Share of the budget spent on the evenly spaced commits
+INITIAL_FRACTION = 0.5
+
+def graph_elements(dot):
+    """Returns the nodes and edges of dot, with their attributes, as a set. None gives the empty set."""
+    if not dot:
+        return frozenset()
+    try:
+        parsed = dot_canon.parse(dot)
+    except dot_canon.UnsupportedDot:
+        # Canonical DOT has one statement per line.
+        return frozenset(line.strip() for line in dot.splitlines())
+    return frozenset(
+        [("node", name, tuple(sorted(attributes.items()))) for name, attributes in parsed.nodes]
+        + [("edge", ends, tuple(sorted(attributes.items()))) for ends, attributes in parsed.edges]
+    )
+
+def graph_delta(elements, other_elements):
+    """Returns the number of nodes and edges that differ between two graph_elements sets."""
+    return len(elements ^ other_elements)
+
+def evenly_spaced(count, samples):
+    """Returns about `samples` indices spread evenly over range(count), including both ends."""
+    if samples >= count:
+        return list(range(count))
+    if samples <= 1:
+        return [count - 1]
+    return sorted({round(i * (count - 1) / (samples - 1)) for i in range(samples)})
+
+def sample_commits(commits, max_frames, build, batch_size=1):
+    """
+    Chooses at most max_frames of commits to build, as described above.
+    build(list of commits) must return their DOTs (None for failed builds) in
+    the same order; it is called with up to batch_size commits at a time
+    once the evenly spaced commits are built. Returns the chosen commits, in
+    their original order, and their DOTs.
+    """
+    if len(commits) <= max_frames:
+        return commits, build(commits)
+
+    dots = {}
+    elements = {}
+    def build_indices(indices):
+        for index, dot in zip(indices, build([commits[i] for i in indices])):
+            dots[index] = dot
+            elements[index] = graph_elements(dot)
+
+    # Intervals between consecutive built commits that can still be split,
+    # most changed (then longest, then latest) first. Only the two halves of
+    # a split interval are new, so each round computes just their deltas.
+    intervals = []
+    def add_interval(start, end):
+        if end - start > 1:
+            delta = graph_delta(elements[start], elements[end])
+            if delta:
+                heapq.heappush(intervals, (-delta, start - end, -((start + end) // 2), start, end))
+
+    initial = evenly_spaced(len(commits), max(2, int(max_frames * INITIAL_FRACTION)))
+    build_indices(initial)
+    for start, end in zip(initial, initial[1:]):
+        add_interval(start, end)
+    while intervals and len(dots) < max_frames:
+        count = min(max(1, batch_size), max_frames - len(dots), len(intervals))
+        splits = [heapq.heappop(intervals)[3:] for _ in range(count)]
+        build_indices(sorted((start + end) // 2 for start, end in splits))
+        for start, end in splits:
+            add_interval(start, (start + end) // 2)
+            add_interval((start + end) // 2, end)
+
+    built = sorted(dots)
+    print(f"Sampled {len(built)} of {len(commits)} commits")
+    return [commits[i] for i in built], [dots[i] for i in built]
@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+
+import batch
+
+def test_read_repos_rejects_duplicate_names(tmp_path):
+    repos_file = tmp_path / "repos.txt"
+    repos_file.write_text("https://github.com/owner2/x  # a fork\n", encoding="utf-8")
+    assert batch.read_repos(["https://github.com/owner1/y"], str(repos_file), "main") == [
+        ("https://github.com/owner1/y", "main"), ("https://github.com/owner2/x", "main")]
+    with pytest.raises(ValueError):
+        batch.read_repos(["https://github.com/owner1/x"], str(repos_file), "main")
+
+def test_cancel_drops_queued_builds():
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        scheduler = batch.FairScheduler(executor, jobs=1)
+        failing, other = scheduler.queue("failing"), scheduler.queue("other")
+        running = failing.submit(release.wait)
+        queued = [failing.submit(str, i) for i in range(3)]
+        survivor = other.submit(str, "other")
+        scheduler.cancel("failing")
+        release.set()
+        assert running.result() is True
+        assert survivor.result() == "other"
+    assert all(future.cancelled() for future in queued)
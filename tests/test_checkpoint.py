@@ -0,0 +1,29 @@
+from datetime import datetime
+
+import checkpoint
+from main import CommitInfo
+
+def commit(commit_id):
+    return CommitInfo(commit_id=commit_id, timestamp=datetime(2025, 1, 1), tree_hash="t" + commit_id)
+
+def test_resume_after_truncated_line(tmp_path):
+    path = str(tmp_path / "repo.journal.jsonl")
+    with checkpoint.open_journal(path, resume=False) as journal:
+        checkpoint.record(journal, commit("a"), "digraph a {}")
+        checkpoint.record(journal, commit("b"), "digraph b {}")
+    # A crash in the middle of writing the entry of b.
+    with open(path, "rb+") as f:
+        f.truncate(f.seek(0, 2) - 5)
+
+    with checkpoint.open_journal(path, resume=True) as journal:
+        checkpoint.record(journal, commit("c"), "digraph c {}")
+
+    assert sorted(checkpoint.load_journal(path)) == ["a", "c"]
+
+def test_failed_builds_are_not_resumed(tmp_path):
+    path = str(tmp_path / "repo.journal.jsonl")
+    with checkpoint.open_journal(path, resume=False) as journal:
+        checkpoint.record(journal, commit("a"), "digraph a {}")
+        checkpoint.record(journal, commit("b"), None)
+
+    assert checkpoint.built_dots(checkpoint.load_journal(path)) == {"a": "digraph a {}"}
@@ -0,0 +1,37 @@
+import subprocess
+
+from benchmarks import fake_graphql
+import get_collaborators
+
+def commit(repo_path, author, message):
+    subprocess.run(["git", "-c", f"user.name={author}", "-c", "user.email=x@example.com",
+                    "commit", "-q", "--allow-empty", "-m", message], cwd=repo_path, check=True)
+
+def fetch(repo_path, cache_dir):
+    with fake_graphql.serve(repo_path) as url:
+        get_collaborators.GRAPHQL_URL = url
+        return get_collaborators.get_revision_history("owner", "repo", "main", cache_dir=str(cache_dir), shas=[])
+
+def logins(contributors):
+    return [contributor["login"] for contributor in contributors]
+
+def test_cache_follows_new_commits_and_force_pushes(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(get_collaborators, "TOKEN", "token")
+    repo_path = tmp_path / "repo"
+    subprocess.run(["git", "init", "-q", "-b", "main", str(repo_path)], check=True)
+    for i, author in enumerate(["alice", "bob", "carol"]):
+        commit(repo_path, author, f"Commit {i}")
+    history, contributors = fetch(repo_path, tmp_path / "cache")
+    assert len(history) == 3 and logins(contributors) == ["alice", "bob", "carol"]
+
+    commit(repo_path, "dave", "Commit 3")
+    capsys.readouterr()
+    history, contributors = fetch(repo_path, tmp_path / "cache")
+    assert "Fetched 1 new commits" in capsys.readouterr().out
+    assert len(history) == 4 and logins(contributors) == ["alice", "bob", "carol", "dave"]
+
+    # Rewrite the branch: carol's and dave's commits are gone.
+    subprocess.run(["git", "reset", "-q", "--hard", "HEAD~2"], cwd=repo_path, check=True)
+    commit(repo_path, "erin", "Commit 2'")
+    history, contributors = fetch(repo_path, tmp_path / "cache")
+    assert len(history) == 3 and logins(contributors) == ["alice", "bob", "erin"]
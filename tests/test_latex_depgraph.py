@@ -0,0 +1,57 @@
+import os
+import random
+
+import latex_depgraph
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "blueprint")
+
+def read_sources(src_dir):
+    sources = {}
+    for root, _dirs, files in os.walk(src_dir):
+        for name in files:
+            if name.endswith((".tex", ".sty")):
+                path = os.path.join(root, name)
+                with open(path, encoding="utf-8") as f:
+                    sources[os.path.relpath(path, src_dir)] = f.read()
+    return sources
+
+def test_fixture_matches_leanblueprint():
+    # expected.dot is the graph `leanblueprint web` 0.0.20 embeds for the fixture.
+    with open(os.path.join(FIXTURE_DIR, "expected.dot"), encoding="utf-8") as f:
+        expected = f.read()
+    dot = latex_depgraph.build_dot(read_sources(os.path.join(FIXTURE_DIR, "src")))
+    assert latex_depgraph.compare_dots(expected, dot) == []
+
+def items(*names):
+    return {name: latex_depgraph.Item(kind="lemma", labels=[name]) for name in names}
+
+def reduce(nodes, edge_names):
+    edges = {(nodes[source], nodes[target]): {} for source, target in edge_names}
+    return {(source.id, target.id) for source, target in latex_depgraph.transitive_reduction(set(nodes.values()), edges)}
+
+def test_transitive_reduction_drops_implied_edges():
+    nodes = items("a", "b", "c", "d")
+    assert reduce(nodes, [("a", "b"), ("b", "c"), ("c", "d"), ("a", "d"), ("b", "d")]) == {
+        ("a", "b"), ("b", "c"), ("c", "d")}
+
+def test_transitive_reduction_on_cycles_does_not_depend_on_order():
+    # b -> d and c -> d each lie on a longer path through the other one.
+    edge_names = [("a", "b"), ("b", "c"), ("c", "a"), ("a", "c"), ("c", "d"), ("b", "d"),
+                  ("d", "e"), ("a", "e")]
+    rng = random.Random(0)
+    results = set()
+    for _ in range(200):
+        rng.shuffle(edge_names)
+        results.add(frozenset(reduce(items("a", "b", "c", "d", "e"), edge_names)))
+    assert results == {frozenset({("a", "b"), ("b", "c"), ("c", "a"), ("a", "c"), ("c", "d"), ("b", "d"),
+                                  ("d", "e")})}
+
+def test_long_uses_chain():
+    lines = [r"\documentclass{report}", r"\usepackage{blueprint}", r"\newtheorem{lemma}{Lemma}",
+             r"\begin{document}"]
+    for i in range(3000):
+        uses = r"\uses{l%d, l0}" % (i - 1) if i > 1 else (r"\uses{l0}" if i else "")
+        lines.append(r"\begin{lemma}\label{l%d}%s\end{lemma}" % (i, uses))
+    lines.append(r"\end{document}")
+    dot = latex_depgraph.build_dot({"web.tex": "\n".join(lines)})
+    assert dot.count("->") == 2999
@@ -0,0 +1,59 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+
+import pytest
+
+import dot_canon
+import layout
+import main
+
+pytestmark = pytest.mark.skipif(shutil.which("dot") is None, reason="needs Graphviz")
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "blueprint")
+
+def fixture_dot():
+    with open(os.path.join(FIXTURE_DIR, "expected.dot"), encoding="utf-8") as f:
+        return main.fix_up_dot(f.read())
+
+def render_json(dot, *args):
+    output = subprocess.run([*args, "-Tjson0"], input=dot, capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+def without_node(dot, name):
+    """Returns dot without the node name and its edges."""
+    parsed = dot_canon.parse(dot)
+    parsed.nodes = [node for node in parsed.nodes if layout.unquote(node[0]) != name]
+    parsed.edges = [edge for edge in parsed.edges if name not in map(layout.unquote, edge[0])]
+    return dot_canon.to_string(parsed)
+
+def render_svg(dot):
+    return subprocess.run(["neato", "-Tsvg"], input=dot, capture_output=True, text=True, check=True).stdout
+
+def test_pinned_nodes_keep_their_positions():
+    dot = fixture_dot()
+    positions = layout.node_positions(dot)
+    pinned = layout.pin_positions(dot, positions)
+    for args in (["neato"], ["neato", "-n"]):
+        assert layout.node_positions(pinned, render_json(pinned, *args)) == positions
+
+def test_union_layout_keeps_nodes_in_place():
+    full = fixture_dot()
+    removed = layout.unquote(dot_canon.parse(full).nodes[-1][0])
+    frames = layout.precompute_union_layout([without_node(full, removed), full])
+    first, second = (layout.node_positions(frame, render_json(frame, "neato")) for frame in frames)
+    assert removed not in first
+    assert set(second) - set(first) == {removed}
+    assert all(second[name] == position for name, position in first.items())
+
+def test_extent_nodes_are_not_drawn():
+    full = fixture_dot()
+    removed = layout.unquote(dot_canon.parse(full).nodes[-1][0])
+    svgs = [render_svg(frame) for frame in layout.precompute_union_layout([without_node(full, removed), full])]
+    for svg in svgs:
+        for name in layout.EXTENT_NODES:
+            assert f"<title>{name}</title>" not in svg
+    # Both frames are drawn on the canvas of the union.
+    assert len({re.search(r'viewBox="([^"]*)"', svg).group(1) for svg in svgs}) == 1
@@ -0,0 +1,43 @@
+import os
+import subprocess
+
+import main
+
+def git(repo_path, *args):
+    return subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                          cwd=repo_path, capture_output=True, text=True, check=True).stdout.strip()
+
+def write(path, name, text):
+    with open(path / name, "w", encoding="utf-8") as f:
+        f.write(text)
+
+def make_upstream(path, commits):
+    os.makedirs(path / "blueprint" / "src")
+    git(path, "init", "-q", "-b", "main")
+    git(path, "config", "uploadpack.allowFilter", "true")
+    for i in range(commits):
+        for name in ("blueprint/src/content.tex", "README.md"):
+            write(path, name, f"version {i}\n")
+        git(path, "add", "-A")
+        git(path, "commit", "-q", "-m", f"Commit {i}")
+    # A commit that leaves blueprint/ as it is.
+    write(path, "README.md", "final\n")
+    git(path, "commit", "-q", "-am", "Update README")
+
+def test_prefetch_lists_only_the_given_commits(tmp_path):
+    make_upstream(tmp_path / "upstream", commits=6)
+    clone = tmp_path / "clone"
+    git(tmp_path, "clone", "-q", "--no-checkout", "--filter=blob:none",
+        f"file://{tmp_path / 'upstream'}", str(clone))
+    assert main.is_partial_clone(clone)
+    commits = git(clone, "rev-list", "--reverse", "origin/main").split()
+
+    # One content.tex per commit, not those of its ancestors or README.md.
+    assert len(main.missing_blueprint_blobs(clone, [commits[-2]])) == 1
+    assert len(main.missing_blueprint_blobs(clone, [commits[-1]])) == 1
+    assert len(main.missing_blueprint_blobs(clone, commits[2:4])) == 2
+
+    main.prefetch_blueprint_blobs(clone, commits[2:4])
+    assert main.missing_blueprint_blobs(clone, commits[2:4]) == []
+    assert len(main.missing_blueprint_blobs(clone, commits)) == 4
+    assert main.missing_blueprint_blobs(clone, ["0" * 40]) == []
@@ -0,0 +1,39 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import latex_depgraph
+import plastex_render
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "blueprint")
+
+def make_repo(path):
+    shutil.copytree(os.path.join(FIXTURE_DIR, "src"), path / "blueprint" / "src")
+    for args in (["init", "-q"], ["add", "-A"], ["-c", "user.name=test", "-c", "user.email=test@example.com",
+                                                 "commit", "-q", "-m", "fixture"]):
+        subprocess.run(["git", *args], cwd=path, check=True)
+    return str(path)
+
+def test_missing_packages_are_raised(tmp_path, monkeypatch):
+    def load():
+        raise ModuleNotFoundError("No module named 'plastexdepgraph'")
+    monkeypatch.setattr(plastex_render, "_load_plastex", load)
+    with pytest.raises(ImportError):
+        plastex_render.get_depgraph(make_repo(tmp_path), "HEAD")
+
+def test_rendering_errors_fail_the_commit(tmp_path, monkeypatch):
+    def render(src_dir, config):
+        raise ValueError("bad document")
+    monkeypatch.setattr(plastex_render, "base_config", lambda: None)
+    monkeypatch.setattr(plastex_render, "render_dot", render)
+    assert plastex_render.get_depgraph(make_repo(tmp_path), "HEAD") is None
+
+def test_fixture_matches_leanblueprint(tmp_path):
+    pytest.importorskip("plastexdepgraph")
+    with open(os.path.join(FIXTURE_DIR, "expected.dot"), encoding="utf-8") as f:
+        expected = f.read()
+    repo_path = make_repo(tmp_path)
+    dot = plastex_render.render_dot(os.path.join(repo_path, latex_depgraph.SRC_DIR))
+    assert latex_depgraph.compare_dots(expected, dot) == []
@@ -0,0 +1,58 @@
+import argparse
+from contextlib import contextmanager
+import subprocess
+
+from benchmarks import fake_graphql, synthetic_repo
+import get_collaborators
+import main
+import sampling
+
+def history(length):
+    """DOTs of a history in which every commit adds a node."""
+    return ["strict digraph {\n" + "".join(f"n{j};\n" for j in range(i + 1)) + "}\n" for i in range(length)]
+
+def test_budget_and_ends():
+    dots = history(500)
+    commits = list(range(len(dots)))
+    chosen, chosen_dots = sampling.sample_commits(commits, 40, lambda batch: [dots[i] for i in batch], batch_size=3)
+    assert len(chosen) == 40
+    assert chosen[0] == 0 and chosen[-1] == 499
+    assert chosen == sorted(chosen)
+    assert chosen_dots == [dots[i] for i in chosen]
+
+def test_deltas_are_computed_once_per_interval(monkeypatch):
+    dots = history(2000)
+    calls = []
+    def graph_delta(elements, other_elements):
+        calls.append(None)
+        return len(elements ^ other_elements)
+    monkeypatch.setattr(sampling, "graph_delta", graph_delta)
+    sampling.sample_commits(list(range(len(dots))), 200, lambda batch: [dots[i] for i in batch])
+    # The initial intervals, then two halves per split.
+    assert len(calls) <= 2 * 200
+
+def test_sampling_rounds_share_one_pool(tmp_path, monkeypatch):
+    upstream = str(tmp_path / "upstream")
+    synthetic_repo.make_repo(upstream, nodes=20, commits=12)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(get_collaborators, "TOKEN", "token")
+    subprocess.run(["git", "clone", "-q", upstream, "repos/repo"], check=True)
+    pools = []
+    build_pool = main.build_pool
+    @contextmanager
+    def counting_pool(jobs, extractor):
+        with build_pool(jobs, extractor) as executor:
+            pools.append(executor)
+            yield executor
+    monkeypatch.setattr(main, "build_pool", counting_pool)
+
+    parser = argparse.ArgumentParser()
+    main.add_build_arguments(parser)
+    args = parser.parse_args(["--rev", "main", "--start-date", "2000-01-01", "--extractor", "latex",
+                              "--jobs", "2", "--max-frames", "8", "--output", str(tmp_path / "output")])
+    (tmp_path / "output").mkdir()
+    with fake_graphql.serve(upstream) as url:
+        monkeypatch.setattr(get_collaborators, "GRAPHQL_URL", url)
+        result = main.animate_repo(args, "owner", "repo", args.output, None)
+    assert result["commits"] == 8
+    assert len(pools) == 1
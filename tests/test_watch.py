@@ -0,0 +1,66 @@
+import argparse
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from benchmarks import fake_graphql, synthetic_repo
+import get_collaborators
+import main
+import watch
+
+def git(repo_path, *args):
+    return subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                          cwd=repo_path, capture_output=True, text=True, check=True).stdout.strip()
+
+def update(upstream, tmp_path, *options):
+    parser = argparse.ArgumentParser()
+    main.add_build_arguments(parser)
+    args = parser.parse_args(["--rev", "main", "--start-date", "2000-01-01", "--extractor", "latex",
+                              "--frame-store", *options])
+    with fake_graphql.serve(upstream) as url:
+        get_collaborators.GRAPHQL_URL = url
+        return watch.update_repo(args, "owner", "repo", str(tmp_path / "output"), None)
+
+def test_update_after_in_place_build(tmp_path, monkeypatch):
+    upstream = str(tmp_path / "upstream")
+    synthetic_repo.make_repo(upstream, nodes=20, commits=5)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(get_collaborators, "TOKEN", "token")
+    os.makedirs("output")
+    git(tmp_path, "clone", "-q", upstream, "repos/repo")
+    clone = str(tmp_path / "repos" / "repo")
+
+    assert update(upstream, tmp_path) == 5
+    # In-place builds end on a detached HEAD, where `git pull` fails.
+    git(clone, "checkout", "-q", "--detach", "HEAD~1")
+
+    with open(os.path.join(upstream, "blueprint", "src", "content.tex"), "a", encoding="utf-8") as f:
+        f.write("\\begin{lemma}\\label{new}\\uses{n0}\\end{lemma}\n")
+    git(upstream, "commit", "-q", "-am", "New lemma")
+
+    assert update(upstream, tmp_path) == 1
+    state = watch.load_state(watch.state_path("output", "repo"))
+    assert state["head"] == git(upstream, "rev-parse", "HEAD")
+    assert state["frames"] == 6
+
+@pytest.mark.skipif(shutil.which("dot") is None, reason="needs Graphviz")
+def test_unchanged_graph_with_precomputed_layout(tmp_path, monkeypatch):
+    upstream = str(tmp_path / "upstream")
+    synthetic_repo.make_repo(upstream, nodes=20, commits=5)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(get_collaborators, "TOKEN", "token")
+    os.makedirs("output")
+    git(tmp_path, "clone", "-q", upstream, "repos/repo")
+
+    assert update(upstream, tmp_path, "--precompute-layout") == 5
+    with open(os.path.join(upstream, "blueprint", "src", "content.tex"), "a", encoding="utf-8") as f:
+        f.write("% A comment\n")
+    git(upstream, "commit", "-q", "-am", "Comment")
+
+    # The stored frames are pinned, the new build is not; the graph is the same.
+    assert update(upstream, tmp_path, "--precompute-layout") == 0
+    state = watch.load_state(watch.state_path("output", "repo"))
+    assert state["head"] == git(upstream, "rev-parse", "HEAD")
+    assert state["frames"] == 5
@@ -0,0 +1,64 @@
+"""Encoding of captured or rendered frames with ffmpeg, shared by record_video.py and render_video.py."""
+import queue
+import subprocess
+import threading
+
+# Frames held in memory while ffmpeg catches up
+FRAME_BUFFER = 64
+
+
+def encoder_options(codec="libx264", crf=23, preset="medium"):
+    """Returns the ffmpeg output options for encoding with codec at the given quality."""
+    return ["-c:v", codec, "-crf", str(crf), "-preset", preset, "-pix_fmt", "yuv420p"]
+
+
+class FrameWriter:
+    """
+    Streams images (PNG or JPEG, see input_codec) into a single ffmpeg
+    process that encodes them to output_path at fps frames per second. A
+    background thread feeds ffmpeg, and write() blocks once max_frames
+    frames are waiting, which bounds the memory used.
+    """
+
+    def __init__(self, output_path, fps, encoder_args, input_codec="png", max_frames=FRAME_BUFFER):
+        self.process = subprocess.Popen(
+            [
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-f", "image2pipe", "-framerate", str(fps), "-c:v", input_codec, "-i", "-",
+                *encoder_args,
+                output_path,
+            ],
+            stdin=subprocess.PIPE,
+        )
+        self.output_path = output_path
+        self.frames = queue.Queue(maxsize=max_frames)
+        self.written = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._feed, daemon=True)
+        self.thread.start()
+
+    def _feed(self):
+        while (frame := self.frames.get()) is not None:
+            if self.error is not None:
+                continue  # keep draining so write() never blocks forever
+            try:
+                self.process.stdin.write(frame)
+            except OSError as e:
+                self.error = e
+
+    def write(self, frame):
+        if self.error is not None:
+            raise RuntimeError(f"ffmpeg stopped accepting frames for {self.output_path}: {self.error}")
+        self.frames.put(frame)
+        self.written += 1
+
+    def close(self):
+        self.frames.put(None)
+        self.thread.join()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+        if self.process.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed encoding {self.output_path}")
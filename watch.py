@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Keep animations up to date as their repositories get new commits.
+
+watch.py polls the clones of one or more repositories. Whenever one of them
+has new commits on its revision, only those commits are built, and their
+frames are appended to the page's frame store (see main.py --frame-store):
+nothing is rewritten but the page itself and the last chunk of the store.
+The last processed commit of each repository is kept in
+<output>/<repo>.watch.json, so watch.py can be stopped and restarted, or run
+with --once from a hook or a cron job. The first update of a repository
+without that file animates its whole history, reusing the journal of an
+earlier main.py run.
+
+Usage:
+    python watch.py https://github.com/owner/repo ... [--repos-file repos.txt] [--interval 300] [--once] [main.py options]
+"""
+import argparse
+import copy
+from datetime import datetime
+import json
+import os
+import subprocess
+import time
+import traceback
+
+from batch import read_repos
+import checkpoint
+import get_collaborators
+import layout
+from main import (add_build_arguments, build_depgraphs, check_build_arguments, clone_repo,
+                  construct_html, dedupe_commits, frame_store_tail, list_commits_chronologically,
+                  parse_repo_url, prefetch_blueprint_blobs, require_github_token, select_frames,
+                  shown_contributors)
+
+def state_path(output_dir, repo_name):
+    return os.path.join(output_dir, f"{repo_name}.watch.json")
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def store_state(path, state):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def resolve_rev(repo_path, rev):
+    """
+    Returns the commit ID of rev in the clone, as fetched from origin when rev
+    is a branch: the leanblueprint extractor leaves the clone on a detached
+    HEAD, after which `git pull` no longer moves the local branch.
+    """
+    for candidate in (f"origin/{rev}", rev):
+        result = subprocess.run(["git", "rev-parse", "--verify", "--quiet", f"{candidate}^{{commit}}"],
+                                cwd=repo_path, capture_output=True, text=True)
+        if result.returncode == 0:
+            return result.stdout.strip()
+    raise ValueError(f"Unknown revision {rev} in {repo_path}")
+
+def update_repo(args, github_owner, github_repo, output_directory, cache_dir):
+    """
+    Builds the commits of args.rev added since the last update and appends
+    their frames to the animation. Returns the number of new frames.
+    """
+    path = state_path(output_directory, github_repo)
+    state = load_state(path)
+    if state.get("rev") != args.rev:
+        state = {}
+
+    repo_path = clone_repo(github_owner, github_repo, partial=args.partial_clone,
+                           sparse=args.sparse_checkout,
+                           shallow_since=args.start_date if args.shallow else None)
+    head = resolve_rev(repo_path, args.rev)
+    if state.get("head") == head:
+        return 0
+
+    rev_range = f"{state['head']}..{head}" if state else head
+    commits = dedupe_commits(list_commits_chronologically(repo_path, rev_range, args.start_date))
+
+    # Only the first update can find its commits in the journal of an
+    # earlier run; later ones would read the whole journal for nothing.
+    journal_file = checkpoint.journal_path(output_directory, github_repo)
+    dots_by_commit = {} if state else checkpoint.built_dots(checkpoint.load_journal(journal_file))
+    pending = [commit for commit in commits if commit.commit_id not in dots_by_commit]
+    prefetch_blueprint_blobs(repo_path, [commit.commit_id for commit in pending])
+    with checkpoint.open_journal(journal_file, resume=True) as journal:
+        built = build_depgraphs(repo_path, pending, cache_dir, args.jobs,
+                                on_result=lambda commit, dot: checkpoint.record(journal, commit, dot),
+                                extractor=args.extractor)
+    dots_by_commit.update(zip((commit.commit_id for commit in pending), built))
+    dots = [dots_by_commit[commit.commit_id] for commit in commits]
+
+    revision_history_by_hash, all_contributors = get_collaborators.get_revision_history_by_hash(
+        github_owner, github_repo, args.rev, cache_dir=cache_dir,
+        shas=[commit.commit_id for commit in commits])
+    contributors, github_users_before = shown_contributors(all_contributors)
+
+    frame_store = os.path.join(output_directory, f"{github_repo}.chunks")
+    previous = None
+    if state:
+        # The stored frames may have pinned positions, so the last one is
+        # compared in the form it was built in, as kept in the journal.
+        entry = checkpoint.find_entry(journal_file, state["frame_commit"]) if state.get("frame_commit") else None
+        if entry and entry["dot"]:
+            previous = entry["dot"]
+        else:
+            _count, last_chunk = frame_store_tail(frame_store)
+            previous = last_chunk[-1]["dot"] if last_chunk else None
+    depgraphs = list(select_frames(commits, dots, revision_history_by_hash, github_users_before,
+                                   previous=previous))
+
+    layout_engine = "dot"
+    if args.precompute_layout:
+        dots = layout.precompute_layouts([depgraph.dot for depgraph in depgraphs], args.jobs)
+        for depgraph, dot in zip(depgraphs, dots):
+            depgraph.dot = dot
+        layout_engine = layout.PINNED_ENGINE
+
+    frame_count = construct_html(depgraphs, f"{github_owner}/{github_repo}",
+                                 os.path.join(output_directory, f"{github_repo}.html"),
+                                 contributors=contributors, layout_engine=layout_engine,
+                                 frame_store=frame_store, append=bool(state),
+                                 offline_cache=os.path.expanduser(args.cache_dir) if args.offline else None)
+    frame_commit = depgraphs[-1].commit.commit_id if depgraphs else state.get("frame_commit")
+    store_state(path, {"rev": args.rev, "head": head, "frame_commit": frame_commit, "frames": frame_count,
+                       "updated": datetime.now().isoformat(timespec="seconds")})
+    return len(depgraphs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Append the frames of new commits to existing animations")
+    parser.add_argument("repo_urls", nargs="*", help="URLs of the projects on github")
+    parser.add_argument("--repos-file", type=str,
+                        help="File with one project URL per line, optionally followed by the revision (# starts a comment)")
+    parser.add_argument("--interval", type=float, default=300, help="Seconds between polls")
+    parser.add_argument("--once", action="store_true", help="Update every repository once and exit, e.g. from a hook")
+    add_build_arguments(parser)
+    args = parser.parse_args()
+    check_build_arguments(parser, args)
+    if args.global_layout or args.history_listed_only or args.max_frames:
+        parser.error("--global-layout, --history-listed-only and --max-frames need the whole history "
+                     "and cannot be used with watch.py")
+    try:
+        repos = read_repos(args.repo_urls, args.repos_file, args.rev)
+    except ValueError as e:
+        parser.error(str(e))
+    if not repos:
+        parser.error("no repositories given")
+    require_github_token()
+
+    output_directory = os.path.expanduser(args.output)
+    os.makedirs(output_directory, exist_ok=True)
+    cache_dir = None if args.no_cache else os.path.expanduser(args.cache_dir)
+
+    while True:
+        failed = False
+        for repo_url, rev in repos:
+            start = time.perf_counter()
+            try:
+                github_owner, github_repo = parse_repo_url(repo_url)
+                repo_args = copy.copy(args)
+                repo_args.rev = rev
+                added = update_repo(repo_args, github_owner, github_repo, output_directory, cache_dir)
+                print(f"{repo_url}: {added} new frames in {time.perf_counter() - start:.1f} s")
+            except Exception:
+                traceback.print_exc()
+                failed = True
+        if args.once:
+            if failed:
+                raise SystemExit(1)
+            return
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    main()